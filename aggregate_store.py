@@ -0,0 +1,187 @@
+import argparse
+import os
+import sqlite3
+import time
+
+import pandas as pd
+
+from data_loader import load_pai, load_soil_moisture, source_fingerprint
+
+
+STORE_PATH = 'senthymed_aggregates.sqlite'
+
+# Variables kept per dataset, and the loader that produces them from a source file
+DATASETS = {
+    'pai': (load_pai, ['PAI']),
+    'soil_moisture': (load_soil_moisture, ['Volumetric soil moisture', 'Soil temperature']),
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS aggregates (
+    dataset TEXT NOT NULL,
+    variable TEXT NOT NULL,
+    plot TEXT NOT NULL,
+    date TEXT NOT NULL,             -- YYYY-MM-DD
+    count INTEGER NOT NULL,
+    sum REAL NOT NULL,
+    min REAL NOT NULL,
+    max REAL NOT NULL,
+    m2 REAL NOT NULL,               -- Sum of squared deviations from the group mean
+    PRIMARY KEY (dataset, variable, plot, date)
+);
+CREATE TABLE IF NOT EXISTS sources (
+    path TEXT PRIMARY KEY,
+    fingerprint TEXT NOT NULL,
+    dataset TEXT NOT NULL,
+    rows INTEGER NOT NULL,
+    ingested_at REAL NOT NULL
+);
+"""
+
+# Chan's parallel update: on conflict the stored group and the new partial group are combined exactly
+_UPSERT = """
+INSERT INTO aggregates (dataset, variable, plot, date, count, sum, min, max, m2)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (dataset, variable, plot, date) DO UPDATE SET
+    count = count + excluded.count,
+    sum = sum + excluded.sum,
+    min = MIN(min, excluded.min),
+    max = MAX(max, excluded.max),
+    m2 = m2 + excluded.m2
+         + (excluded.sum / excluded.count - sum / count) * (excluded.sum / excluded.count - sum / count)
+           * count * excluded.count / (count + excluded.count)
+"""
+
+
+def partial_aggregates(df, variable, time_column='MEAS_DATETIME'):
+    """count/sum/min/max/M2 of one variable per (PLOT, day), NaNs excluded."""
+    # Only the distinct days are formatted as strings
+    codes, days = pd.factorize(df[time_column].dt.normalize())
+    dates = pd.Categorical.from_codes(codes, categories=days.strftime('%Y-%m-%d'))
+    values = df[['PLOT', variable]].assign(date=dates).dropna(subset=[variable])
+    groups = values.groupby(['PLOT', 'date'], observed=True, sort=False)[variable]
+    partial = groups.agg(['count', 'sum', 'min', 'max', 'mean'])
+    deviations = values[variable] - groups.transform('mean')
+    partial['m2'] = (deviations ** 2).groupby([values['PLOT'], values['date']], observed=True, sort=False).sum()
+    return partial.drop(columns='mean').reset_index()
+
+
+class AggregateStore:
+    """Running per-(PLOT, day) aggregates in SQLite; ingesting a file only touches the groups it contains."""
+
+    def __init__(self, path=STORE_PATH):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript(_SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ---------------  Ingestion  ------------
+
+    @staticmethod
+    def _upsert_rows(dataset, df, variables, time_column):
+        rows = []
+        for variable in variables:
+            partial = partial_aggregates(df, variable, time_column)
+            rows.extend((dataset, variable, plot, date, int(count), float(total), float(low), float(high), float(m2))
+                        for plot, date, count, total, low, high, m2 in partial.itertuples(index=False))
+        return rows
+
+    def ingest_frame(self, dataset, df, variables, time_column='MEAS_DATETIME'):
+        rows = self._upsert_rows(dataset, df, variables, time_column)
+        with self.connection:
+            self.connection.executemany(_UPSERT, rows)
+        return len(rows)
+
+    def ingest_file(self, dataset, path):
+        """
+        Fold a source file into the store. A file already ingested with the same fingerprint is skipped;
+        one that changed since raises, because its old contribution can't be subtracted (rebuild the store).
+        Returns the number of (variable, plot, day) groups updated.
+        """
+        loader, variables = DATASETS[dataset]
+        path = os.path.abspath(path)
+        fingerprint = source_fingerprint(path)
+        stored = self.connection.execute('SELECT fingerprint FROM sources WHERE path = ?', (path,)).fetchone()
+        if stored is not None:
+            if stored[0] == fingerprint:
+                return 0
+            raise ValueError(f"{path} changed since it was ingested; rebuild {self.path} to include it")
+
+        df = loader(path)
+        rows = self._upsert_rows(dataset, df, variables, 'MEAS_DATETIME')
+        # One transaction: the file's groups are never in the store without its sources row, or the reverse
+        with self.connection:
+            self.connection.executemany(_UPSERT, rows)
+            self.connection.execute('INSERT INTO sources VALUES (?, ?, ?, ?, ?)',
+                                    (path, fingerprint, dataset, len(df), time.time()))
+        return len(rows)
+
+    # ---------------  Views  ------------
+
+    def _query(self, dataset, variable, keys, key_names):
+        sql = f"""
+            SELECT {keys},
+                   SUM(count) AS count,
+                   SUM(sum) * 1.0 / SUM(count) AS mean,
+                   MIN(min) AS min,
+                   MAX(max) AS max,
+                   SUM(m2 + sum * sum / count) - SUM(sum) * SUM(sum) / SUM(count) AS m2
+            FROM aggregates
+            WHERE dataset = ? AND variable = ?
+            GROUP BY {keys}
+            ORDER BY {keys}
+        """
+        result = pd.read_sql_query(sql, self.connection, params=(dataset, variable))
+        result['std'] = (result['m2'].clip(lower=0) / (result['count'] - 1)).pow(0.5).where(result['count'] > 1)
+        result = result.drop(columns='m2')
+        result.columns = key_names + list(result.columns[len(key_names):])
+        return result
+
+    def daily(self, dataset, variable):
+        """Mean, count, min, max and std per day over all plots."""
+        daily = self._query(dataset, variable, 'date', ['Date'])
+        daily['Date'] = pd.to_datetime(daily['Date'])
+        return daily
+
+    def plot_daily(self, dataset, variable):
+        daily = self._query(dataset, variable, 'plot, date', ['PLOT', 'Date'])
+        daily['Date'] = pd.to_datetime(daily['Date'])
+        return daily
+
+    def monthly(self, dataset, variable):
+        """Per plot and calendar month, dated at the month end like resample('M')."""
+        monthly = self._query(dataset, variable, 'plot, substr(date, 1, 7)', ['PLOT', 'Month'])
+        monthly['Month'] = pd.to_datetime(monthly['Month'], format='%Y-%m') + pd.offsets.MonthEnd(0)
+        return monthly
+
+    def per_plot(self, dataset, variable):
+        return self._query(dataset, variable, 'plot', ['PLOT'])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Incremental per-plot, per-day aggregate store.')
+    parser.add_argument('--store', default=STORE_PATH)
+    commands = parser.add_subparsers(dest='command', required=True)
+    ingest = commands.add_parser('ingest', help='Fold new measurement files into the store')
+    ingest.add_argument('dataset', choices=sorted(DATASETS))
+    ingest.add_argument('paths', nargs='+')
+    view = commands.add_parser('view', help='Print a daily, monthly or per-plot view')
+    view.add_argument('dataset', choices=sorted(DATASETS))
+    view.add_argument('variable')
+    view.add_argument('--by', choices=['daily', 'plot_daily', 'monthly', 'per_plot'], default='daily')
+    args = parser.parse_args()
+
+    with AggregateStore(args.store) as store:
+        if args.command == 'ingest':
+            for path in args.paths:
+                print(f"{path}: {store.ingest_file(args.dataset, path)} groups updated")
+        else:
+            print(getattr(store, args.by)(args.dataset, args.variable).to_string(index=False))
@@ -0,0 +1,172 @@
+import argparse
+import contextlib
+import multiprocessing
+import os
+import runpy
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from data_loader import LEAF_TRAITS_DATA_PATH, PAI_DATA_PATH, SOIL_MOISTURE_DATA_PATH
+from plot_registry import SOIL_MOISTURE_SHAPEFILE
+
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+OUTPUT_DIR = 'batch_output'
+SUMMARY_FILE = 'batch_summary.csv'
+
+# Analyses run per campaign, with the input files they need (relative to the campaign directory)
+ANALYSES = {
+    'pai': ('pai_analysis.py', [PAI_DATA_PATH]),
+    'soil_moisture': ('soil_moisture_analysis.py', [SOIL_MOISTURE_DATA_PATH, SOIL_MOISTURE_SHAPEFILE]),
+    'fire_risk': ('fire_risk.py', [PAI_DATA_PATH, SOIL_MOISTURE_DATA_PATH, LEAF_TRAITS_DATA_PATH]),
+}
+
+# Script variables written to the campaign output directory as CSV, per analysis
+RESULT_TABLES = {
+    'pai': ['plot_averages'],
+    'soil_moisture': ['daily_data'],
+    'fire_risk': ['risk_distribution', 'plot_day_risk'],
+}
+
+
+def read_manifest(path):
+    """
+    Campaigns listed one per line as `directory [name]`; blank lines and # comments are ignored.
+    Relative directories are resolved against the manifest's location. The name defaults to the directory name.
+    """
+    base = os.path.dirname(os.path.abspath(path))
+    campaigns = []
+    with open(path) as f:
+        for line in f:
+            line = line.split('#', 1)[0].strip()
+            if not line:
+                continue
+            directory, _, name = line.partition(' ')
+            directory = os.path.normpath(os.path.join(base, directory))
+            campaigns.append((name.strip() or os.path.basename(directory), directory))
+    names = [name for name, _ in campaigns]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"Duplicate campaign names in {path}: {', '.join(duplicates)}")
+    return campaigns
+
+
+# ---------------  Worker (one fresh interpreter per campaign)  ------------
+
+def _run_analysis(analysis, out_dir):
+    import rendering  # Imported here, after run_campaign has set the backend and figure settings
+    rendering._pending.clear()  # Figures queued by a failed attempt or earlier analysis must not render into this one
+    script, _ = ANALYSES[analysis]
+    log_path = os.path.join(out_dir, f'{analysis}.log')
+    with open(log_path, 'w') as log, contextlib.redirect_stdout(log), contextlib.redirect_stderr(log):
+        try:
+            namespace = runpy.run_path(os.path.join(REPO_DIR, script), run_name='__main__')
+        except BaseException:
+            traceback.print_exc()
+            raise
+    for name in RESULT_TABLES[analysis]:
+        table = namespace.get(name)
+        if isinstance(table, (pd.DataFrame, pd.Series)):
+            table.to_csv(os.path.join(out_dir, f'{analysis}_{name}.csv'))
+    return namespace
+
+
+def _metrics(analysis, namespace):
+    """A few headline numbers per analysis for the consolidated summary."""
+    if analysis == 'pai':
+        return {'pai_rows': len(namespace['pai_df']), 'pai_mean': namespace['pai_df']['PAI'].mean()}
+    if analysis == 'soil_moisture':
+        moisture = namespace['soil_moisture_combined']['Volumetric soil moisture']
+        return {'moisture_rows': len(moisture), 'moisture_mean': moisture.mean()}
+    distribution = namespace['risk_distribution']
+    return {f'risk_{label.split()[0].lower()}_pct': share for label, share in distribution.items()}
+
+
+def run_campaign(name, directory, out_root, analyses, retries=1):
+    """
+    Run the analyses for one campaign with its own figure, cache and log directory.
+    A failing analysis is retried up to `retries` times, then recorded as failed; the other analyses still run.
+    An analysis whose input files are missing is skipped; a campaign directory that doesn't exist fails them all.
+    Returns one summary row per analysis.
+    """
+    if not os.path.isdir(directory):
+        return [{'campaign': name, 'analysis': analysis, 'status': 'failed', 'attempts': 0, 'seconds': 0.0,
+                 'error': f'campaign directory {directory} not found'} for analysis in analyses]
+    out_dir = os.path.abspath(os.path.join(out_root, name))
+    os.makedirs(out_dir, exist_ok=True)
+    # Settings are read from the environment by the analysis modules (rendering selects Agg when it is imported)
+    os.environ.update({'SENTHYMED_FIGURE_DIR': os.path.join(out_dir, 'figures'),
+                       'SENTHYMED_CACHE_DIR': os.path.join(out_dir, '.senthymed_cache'),
+                       'SENTHYMED_RENDER_WORKERS': '1', 'MPLBACKEND': 'Agg'})
+    sys.path.insert(0, REPO_DIR)
+
+    rows = []
+    for analysis in analyses:
+        row = {'campaign': name, 'analysis': analysis, 'status': 'ok', 'attempts': 0, 'seconds': 0.0, 'error': ''}
+        missing = [path for path in ANALYSES[analysis][1] if not os.path.exists(os.path.join(directory, path))]
+        if missing:
+            rows.append({**row, 'status': 'skipped', 'error': f"missing {', '.join(missing)}"})
+            continue
+        os.chdir(directory)  # The scripts read their input files relative to the working directory
+        start = time.perf_counter()
+        while True:
+            row['attempts'] += 1
+            try:
+                row.update(_metrics(analysis, _run_analysis(analysis, out_dir)))
+                break
+            except Exception as error:
+                if row['attempts'] > retries:
+                    row.update(status='failed', error=f'{type(error).__name__}: {error}')
+                    break
+        row['seconds'] = round(time.perf_counter() - start, 3)
+        rows.append(row)
+    return rows
+
+
+# ---------------  Batch  ------------
+
+def run_batch(campaigns, out_root=OUTPUT_DIR, analyses=tuple(ANALYSES), workers=None, retries=1):
+    """
+    Run every campaign in a process pool of at most `workers` processes (default: one per core).
+    Each campaign gets a fresh interpreter, so settings and module state never leak between campaigns.
+    Returns the consolidated summary, one row per (campaign, analysis), and writes it to out_root.
+    """
+    os.makedirs(out_root, exist_ok=True)
+    out_root = os.path.abspath(out_root)
+    rows = []
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                             max_tasks_per_child=1) as pool:
+        futures = {pool.submit(run_campaign, name, directory, out_root, list(analyses), retries): name
+                   for name, directory in campaigns}
+        for future in as_completed(futures):
+            try:
+                rows.extend(future.result())
+            except Exception as error:  # The worker process itself died
+                rows.extend({'campaign': futures[future], 'analysis': analysis, 'status': 'failed', 'attempts': 1,
+                             'seconds': 0.0, 'error': f'{type(error).__name__}: {error}'} for analysis in analyses)
+    summary = pd.DataFrame(rows).sort_values(['campaign', 'analysis'], ignore_index=True)
+    summary.to_csv(os.path.join(out_root, SUMMARY_FILE), index=False)
+    return summary
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run the PAI, soil moisture and fire risk analyses over many campaigns.')
+    parser.add_argument('manifest', help='Text file listing one campaign directory per line, optionally followed by a name')
+    parser.add_argument('--out', default=OUTPUT_DIR)
+    parser.add_argument('--analyses', nargs='+', choices=sorted(ANALYSES), default=list(ANALYSES))
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--retries', type=int, default=1)
+    args = parser.parse_args()
+
+    summary = run_batch(read_manifest(args.manifest), args.out, args.analyses, args.workers, args.retries)
+    print(summary.drop(columns='error').to_string(index=False))
+    problems = summary[summary['status'] != 'ok']
+    for row in problems.itertuples():
+        print(f"{row.campaign}/{row.analysis} {row.status}: {row.error}")
+    if (problems['status'] == 'failed').any():
+        print(f"\nSome analyses failed; see the .log files under {args.out}")
+        sys.exit(1)
@@ -0,0 +1,156 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from data_loader import LEAF_TRAITS_DATA_PATH, PAI_DATA_PATH, SOIL_MOISTURE_DATA_PATH
+from profiling import peak_rss_mb
+from synthetic_data import generate_campaign
+
+
+DEFAULT_SCALES = [10, 100, 1000]
+DATA_DIR = 'bench_data'
+HISTORY_PATH = 'benchmark_history.json'
+
+
+class StageTimer:
+    """Times named stages; peak RSS is the process high-water mark when the stage ends."""
+
+    def __init__(self):
+        self.stages = []
+
+    def run(self, name, function, *args, rows_in=None):
+        start = time.perf_counter()
+        result = function(*args)
+        seconds = time.perf_counter() - start
+        rows_out = len(result) if hasattr(result, '__len__') else None
+        self.stages.append({'stage': name, 'seconds': round(seconds, 6), 'peak_rss_mb': round(peak_rss_mb(), 1),
+                            'rows_in': rows_in, 'rows_out': rows_out})
+        return result
+
+
+# ---------------  Pipeline stages, as the scripts run them  ------------
+
+def run_pipeline(directory):
+    from data_loader import build_timestamps, clean_soil_moisture, load_pai
+    from plot_registry import SOURCE_CRS, PlotRegistry
+    from risk_engine import default_rules, score_risk
+    from rolling_engine import rolling_plot_stats
+    import geopandas as gpd
+    import shapely
+
+    pai_path = os.path.join(directory, os.path.basename(PAI_DATA_PATH))
+    moisture_path = os.path.join(directory, os.path.basename(SOIL_MOISTURE_DATA_PATH))
+    leaf_path = os.path.join(directory, os.path.basename(LEAF_TRAITS_DATA_PATH))
+    timer = StageTimer()
+
+    read = lambda path: pd.read_csv(path, delimiter='\t', dtype={'SITE_PLOT': str, 'MEAS_TIME': str})
+    pai = timer.run('load_pai', read, pai_path)
+    moisture = timer.run('load_soil_moisture', read, moisture_path)
+    timer.run('load_leaf_traits', read, leaf_path)
+
+    timer.run('datetime_parse', lambda: pd.to_datetime(pai['MEAS_DATE'].astype(str) + ' ' + pai['MEAS_TIME'],
+                                                       format='%Y%m%d %H:%M:%S'), rows_in=len(pai))
+    timer.run('datetime_parse_fast', build_timestamps, pai['MEAS_DATE'], pai['MEAS_TIME'], rows_in=len(pai))
+
+    def clean():
+        cleaned = moisture.dropna(subset=['Volumetric soil moisture', 'MEAS_DATE', 'MEAS_TIME']).copy()
+        for column in ['Volumetric soil moisture', 'Soil temperature', 'EC']:
+            cleaned[column] = cleaned[column].str.replace(',', '.')
+        return clean_soil_moisture(cleaned)
+    moisture = timer.run('cleaning', clean, rows_in=len(moisture))
+
+    # Loader paths: first call parses and writes the Arrow cache, the second reads it memory-mapped
+    cache_dir = os.path.join(directory, '.senthymed_cache')
+    for stale in os.listdir(cache_dir) if os.path.isdir(cache_dir) else []:
+        os.remove(os.path.join(cache_dir, stale))
+    timer.run('loader_parse_and_cache', lambda: load_pai(pai_path, cache_dir=cache_dir))
+    pai = timer.run('loader_cached', lambda: load_pai(pai_path, cache_dir=cache_dir))
+
+    timer.run('groupby_daily', lambda: pai.groupby(pai['MEAS_DATETIME'].dt.normalize())['PAI'].mean(), rows_in=len(pai))
+    timer.run('groupby_resample_monthly',
+              lambda: pai.set_index('MEAS_DATETIME').groupby('PLOT').resample('M')['PAI'].mean(), rows_in=len(pai))
+    timer.run('rolling_time_windows', rolling_plot_stats, pai, ['PAI'], ('7D', '30D'), rows_in=len(pai))
+
+    rules = default_rules(pai['PAI'].quantile(0.75), 5.0)
+    timer.run('risk_classification', lambda: score_risk(pai['PAI'], moisture['Volumetric soil moisture'].mean(), rules)[0],
+              rows_in=len(pai))
+
+    # Synthetic locations for every ID_LOC, as the shapefile would provide them
+    id_locs = moisture['ID_LOC'].unique()
+    rng = np.random.default_rng(0)
+    locations = gpd.GeoDataFrame({'ID_LOC': id_locs},
+                                 geometry=shapely.points(500000 + rng.random(len(id_locs)) * 5000,
+                                                         4800000 + rng.random(len(id_locs)) * 5000), crs=SOURCE_CRS)
+    registry = PlotRegistry(locations)
+    located = timer.run('shapefile_merge', registry.attach, moisture, rows_in=len(moisture))
+    timer.run('reprojection', lambda: registry.to_geodataframe(located, crs='EPSG:4326'), rows_in=len(located))
+    return timer.stages
+
+
+# ---------------  Harness  ------------
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_scale(scale, data_dir=DATA_DIR, seed=0):
+    """Generate (once) and benchmark one scale in a fresh interpreter, so peak RSS is per run."""
+    directory = os.path.join(data_dir, f'x{scale}')
+    if not os.path.exists(os.path.join(directory, os.path.basename(PAI_DATA_PATH))):
+        generate_campaign(directory, scale, seed)
+    output = subprocess.run([sys.executable, os.path.abspath(__file__), '--worker', directory],
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def load_history(path=HISTORY_PATH):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return json.load(f)
+
+
+def print_comparison(run, previous):
+    before = {stage['stage']: stage for stage in previous['stages']} if previous else {}
+    print(f"\nScale x{run['scale']}:")
+    for stage in run['stages']:
+        line = f"  {stage['stage']:<26} {stage['seconds']:>10.4f} s  {stage['peak_rss_mb']:>9.1f} MB"
+        if stage['stage'] in before and before[stage['stage']]['seconds'] > 0:
+            line += f"  ({stage['seconds'] / before[stage['stage']]['seconds']:.2f}x previous)"
+        print(line)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the analysis pipeline on synthetic campaigns.')
+    parser.add_argument('--scales', type=int, nargs='+', default=DEFAULT_SCALES)
+    parser.add_argument('--data-dir', default=DATA_DIR)
+    parser.add_argument('--history', default=HISTORY_PATH)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_pipeline(args.worker)))
+        sys.exit(0)
+
+    history = load_history(args.history)
+    for scale in args.scales:
+        previous = next((run for run in reversed(history) if run['scale'] == scale), None)
+        run = {'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'), 'commit': _git_commit(), 'scale': scale,
+               'python': platform.python_version(), 'pandas': pd.__version__, 'numpy': np.__version__,
+               'stages': run_scale(scale, args.data_dir, args.seed)}
+        print_comparison(run, previous)
+        history.append(run)
+        with open(args.history, 'w') as f:
+            json.dump(history, f, indent=2)
@@ -0,0 +1,58 @@
+import argparse
+
+import numpy as np
+
+from risk_engine import classify_risk, default_rules
+
+
+# Compares the vectorized risk engine with the row-wise rules fire_risk.py used to apply,
+# on random readings including NaN, infinities and values exactly at the thresholds. Exits non-zero on a mismatch.
+
+
+def determine_fire_risk(pai, soil_moisture, pai_threshold, moisture_threshold):
+    """The original per-row rule of fire_risk.py, kept verbatim as the reference."""
+    if pai >= pai_threshold and soil_moisture <= moisture_threshold:
+        return 'High Risk'
+    elif pai < pai_threshold and soil_moisture > moisture_threshold:
+        return 'Low Risk'
+    else:
+        return 'Moderate Risk'
+
+
+def synthetic_readings(rows, pai_threshold, moisture_threshold, seed=0):
+    rng = np.random.default_rng(seed)
+    pai = rng.uniform(0, 6, rows)
+    moisture = rng.uniform(0, 30, rows)
+    # Values on the thresholds and non-finite values, where comparison semantics matter most
+    specials = [np.nan, np.inf, -np.inf]
+    pai[rng.choice(rows, rows // 10, replace=False)] = pai_threshold
+    moisture[rng.choice(rows, rows // 10, replace=False)] = moisture_threshold
+    pai[rng.choice(rows, rows // 50, replace=False)] = rng.choice(specials, rows // 50)
+    moisture[rng.choice(rows, rows // 50, replace=False)] = rng.choice(specials, rows // 50)
+    return pai, moisture
+
+
+def check(rows=100000, pai_threshold=2.5, moisture_threshold=5.0, seed=0):
+    pai, moisture = synthetic_readings(rows, pai_threshold, moisture_threshold, seed)
+    rules = default_rules(pai_threshold, moisture_threshold)
+    mismatches = 0
+    # Per-row moisture (the plot-day table) and one broadcast campaign mean (risk_distribution), NaN included
+    for name, soil_moisture in [('per row', moisture), ('scalar', moisture_threshold), ('scalar NaN', np.nan)]:
+        ours = classify_risk(pai, soil_moisture, rules).astype(str).to_numpy()
+        reference = np.array([determine_fire_risk(p, m, pai_threshold, moisture_threshold)
+                              for p, m in zip(pai, np.broadcast_to(soil_moisture, pai.shape))])
+        differing = int((ours != reference).sum())
+        print(f"{name:<10} moisture: {differing} of {rows} rows differ")
+        mismatches += differing
+    return mismatches
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Check risk_engine against the row-wise determine_fire_risk rules.')
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    if check(args.rows, seed=args.seed):
+        raise SystemExit('Risk levels differ from determine_fire_risk')
+    print('All risk levels match determine_fire_risk')
@@ -0,0 +1,80 @@
+import argparse
+
+import numpy as np
+import pandas as pd
+
+import data_loader
+from data_loader import build_timestamps
+
+
+# Compares build_timestamps with the string parse it replaces, pd.to_datetime on 'YYYYMMDD HH:MM:SS',
+# on synthetic dates and times: bit-identical results, or the same error. Exits non-zero on a mismatch.
+
+
+def string_parse(dates, times=None):
+    if times is None:
+        return pd.to_datetime(dates.astype(str), format='%Y%m%d')
+    return pd.to_datetime(dates.astype(str) + ' ' + times.astype(str), format='%Y%m%d %H:%M:%S')
+
+
+def synthetic_columns(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    # Dates across leap years and centuries (1900 and 2100 are not leap years, 2000 is)
+    days = rng.integers(pd.Timestamp('1899-01-01').value // 86_400_000_000_000,
+                        pd.Timestamp('2101-12-31').value // 86_400_000_000_000, rows)
+    dates = pd.Series(pd.to_datetime(days, unit='D').strftime('%Y%m%d').astype('int64'))
+    seconds = rng.integers(0, 86_400, rows)
+    times = pd.Series([f'{s // 3600:02d}:{s // 60 % 60:02d}:{s % 60:02d}' for s in seconds], dtype=object)
+    return dates, times
+
+
+def _compare(name, dates, times=None, fast=False):
+    data_loader._date_ns.clear()  # Convert from scratch, not from values remembered by an earlier case
+    data_loader._time_ns.clear()
+    try:
+        expected = string_parse(dates, times)
+    except ValueError as error:
+        expected = error
+    try:
+        result = build_timestamps(dates, times)
+    except ValueError as error:
+        result = error
+    if isinstance(expected, Exception) or isinstance(result, Exception):
+        ok = type(expected) is type(result)
+        detail = f"raises {type(result).__name__}" if isinstance(result, Exception) else 'returns a result'
+    else:
+        ok = result.dtype == expected.dtype and np.array_equal(result.to_numpy().view('int64'),
+                                                               expected.to_numpy().view('int64'))
+        detail = f"{len(result)} rows"
+    if fast and not (data_loader._date_ns and (times is None or data_loader._time_ns)):
+        ok, detail = False, detail + ', fell back to the string parse'  # Correct but slow: the fast path broke
+    print(f"{name:<28} {detail}{'' if ok else '  MISMATCH'}")
+    return ok
+
+
+def check(rows=1_000_000, seed=0):
+    dates, times = synthetic_columns(rows, seed)
+    fast_cases = [('dates and times', dates, times), ('dates only', dates, None)]
+    cases = [
+        # Formats outside the fast path, which must fall back to the string parse
+        ('single-digit hours', pd.Series([20210601, 20210602]), pd.Series(['7:05:00', '23:59:59'])),
+        ('impossible date', pd.Series([20210230]), pd.Series(['12:00:00'])),
+        ('month 13', pd.Series([20211301]), None),
+        ('hour 24', pd.Series([20210601]), pd.Series(['24:00:00'])),
+        ('missing time', pd.Series([20210601, 20210602]), pd.Series(['12:00:00', np.nan], dtype=object)),
+        ('float dates', pd.Series([20210601.0, np.nan]), None),
+    ]
+    failures = [name for name, case_dates, case_times in fast_cases if not _compare(name, case_dates, case_times, True)]
+    return failures + [name for name, case_dates, case_times in cases if not _compare(name, case_dates, case_times)]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Check build_timestamps against the pd.to_datetime string parse.')
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    failures = check(args.rows, args.seed)
+    if failures:
+        raise SystemExit(f"build_timestamps differs from the string parse: {', '.join(failures)}")
+    print('build_timestamps matches the string parse')
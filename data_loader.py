@@ -0,0 +1,306 @@
+import contextlib
+import hashlib
+import os
+import re
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from profiling import profiled, stage
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+except ImportError:  # The cache is optional; without pyarrow every load parses the text file
+    pa = None
+
+
+# ---------------  Source files and cache location  ------------
+
+PAI_DATA_PATH = 'SENTHYMED_MEDOAK_canopy_plant_area_index_data.txt'
+SOIL_MOISTURE_DATA_PATH = 'SENTHYMED_MEDOAK_soil_moisture_data.txt'
+LEAF_TRAITS_DATA_PATH = 'SENTHYMED_MEDOAK_leaf_traits_data.txt'
+
+CACHE_DIR = '.senthymed_cache'  # Overridden by SENTHYMED_CACHE_DIR, read at call time
+CACHE_VERSION = 2  # Bump when the parsed representation changes, so stale caches are not served
+
+# Columns that hold measurement values written with decimal commas in the soil moisture export
+SOIL_MOISTURE_VALUE_COLUMNS = ['Volumetric soil moisture', 'Soil temperature', 'EC']
+
+# decimal=',' turns '4,21' into 4.21 while parsing, so no str.replace pass is needed afterwards
+SOIL_MOISTURE_CSV_OPTIONS = dict(delimiter='\t', decimal=',',
+                                 dtype={'SITE_PLOT': str, 'MEAS_TIME': str, 'ID_LOC': str})
+
+
+# ---------------  Timestamps  ------------
+# MEAS_DATE holds YYYYMMDD integers and MEAS_TIME 'HH:MM:SS' strings. Each distinct value is converted once,
+# arithmetically, and remembered across calls (there are few distinct days and at most 86400 distinct times),
+# so no concatenated string column is ever built.
+
+_TIME_PATTERN = re.compile(r'^([01][0-9]|2[0-3]):([0-5][0-9]):([0-5][0-9])$')
+_NS_PER_SECOND = 10 ** 9
+_NS_PER_DAY = 86_400 * _NS_PER_SECOND
+_date_ns = {}
+_time_ns = {}
+
+
+def _days_from_civil(year, month, day):
+    # Days since 1970-01-01 in the proleptic Gregorian calendar (H. Hinnant's algorithm), vectorized
+    year = year - (month <= 2)
+    era = year // 400
+    year_of_era = year - era * 400
+    day_of_year = (153 * np.where(month > 2, month - 3, month + 9) + 2) // 5 + day - 1
+    day_of_era = year_of_era * 365 + year_of_era // 4 - year_of_era // 100 + day_of_year
+    return era * 146097 + day_of_era - 719468
+
+
+def _dates_to_ns(dates):
+    dates = np.asarray(dates, dtype='int64')
+    year, month, day = dates // 10000, dates // 100 % 100, dates % 100
+    days = _days_from_civil(year, month, day)
+    # Reject anything strptime('%Y%m%d') would not accept the same way (month 13, 31 February, ...)
+    back = days.astype('datetime64[D]')
+    valid = ((year >= 1000) & (year <= 9999)
+             & (back.astype('datetime64[Y]').astype('int64') + 1970 == year)
+             & (back.astype('datetime64[M]').astype('int64') % 12 + 1 == month)
+             & ((back - back.astype('datetime64[M]')).astype('int64') + 1 == day))
+    return days * _NS_PER_DAY if valid.all() else None
+
+
+def _times_to_ns(times):
+    matches = [_TIME_PATTERN.match(time) if isinstance(time, str) else None for time in times]
+    if not all(matches):
+        return None
+    return [(int(m[1]) * 3600 + int(m[2]) * 60 + int(m[3])) * _NS_PER_SECOND for m in matches]
+
+
+def _lookup(uniques, cache, convert):
+    missing = [value for value in uniques if value not in cache]
+    if missing:
+        converted = convert(missing)
+        if converted is None:
+            return None
+        cache.update(zip(missing, converted))
+    return np.fromiter((cache[value] for value in uniques), dtype='int64', count=len(uniques))
+
+
+@profiled('build_timestamps', rows_in_arg=0)
+def build_timestamps(dates, times=None):
+    """
+    datetime64[ns] Series from integer YYYYMMDD dates and optional 'HH:MM:SS' times.
+    Identical to pd.to_datetime(dates.astype(str) + ' ' + times.astype(str), format='%Y%m%d %H:%M:%S');
+    inputs outside the strict fast-path format (NaNs, single-digit hours, ...) take that slow path.
+    """
+    dates = pd.Series(dates)
+    result = None
+    if pd.api.types.is_integer_dtype(dates.dtype):
+        date_codes, date_uniques = pd.factorize(dates.to_numpy())
+        date_ns = _lookup(date_uniques.tolist(), _date_ns, _dates_to_ns)
+        if date_ns is not None:
+            result = date_ns[date_codes]
+            if times is not None:
+                time_codes, time_uniques = pd.factorize(np.asarray(times, dtype=object))
+                time_ns = _lookup(time_uniques.tolist(), _time_ns, _times_to_ns)
+                result = result + time_ns[time_codes] if time_ns is not None and (time_codes >= 0).all() else None
+    if result is not None:
+        return pd.Series(result.view('datetime64[ns]'), index=dates.index)
+
+    if times is None:
+        return pd.to_datetime(dates.astype(str), format='%Y%m%d')
+    return pd.to_datetime(dates.astype(str) + ' ' + pd.Series(times, index=dates.index).astype(str),
+                          format='%Y%m%d %H:%M:%S')
+
+
+# ---------------  Compact in-memory schema  ------------
+# Repeated keys are categoricals, sensor readings float32 and small counters int16. PAI stays float64
+# because the risk thresholds are quantiles of it. PAI MEAS_TIME stays a string: it is close to unique per row,
+# so a categorical would cost more than it saves. Soil moisture and leaf sampling times repeat per campaign visit.
+
+CATEGORY = 'category'
+
+PAI_SCHEMA = {
+    'ID_LOC': CATEGORY, 'MEAS_DATE': 'int32', 'SITE': CATEGORY, 'SITE_PLOT': CATEGORY, 'PAI_DEVICE_LAB': CATEGORY,
+    'PAI_DEVICE_TYPE': CATEGORY, 'PAI_MEAS_TYPE': CATEGORY, 'ID_MEAS': 'int16',
+    'GAP1': 'float32', 'GAP2': 'float32', 'GAP3': 'float32', 'GAP4': 'float32', 'GAP5': 'float32',
+    'BAD_READINGS': CATEGORY,
+}
+
+SOIL_MOISTURE_SCHEMA = {
+    'ID_LOC': CATEGORY, 'MEAS_DATE': 'int32', 'MEAS_TIME': CATEGORY, 'MOISTURE_DEVICE_LAB': CATEGORY,
+    'MOISTURE_DEVICE_TYPE': CATEGORY, 'SITE': CATEGORY, 'SITE_PLOT': CATEGORY, 'ID_MEAS': 'int16',
+    'Repetition': 'int16', 'Depth': 'Int16', 'Volumetric soil moisture': 'float32', 'Soil temperature': 'float32',
+    'EC': 'float32', 'SHA/SUN': CATEGORY,
+}
+
+LEAF_TRAITS_SCHEMA = {
+    'ID_LOC': CATEGORY, 'SAMPLING_DATE': 'int32', 'SAMPLING_TIME': CATEGORY, 'SITE': CATEGORY,
+    'SITE_PLOT': CATEGORY, 'SPECIES': CATEGORY, 'TREE': CATEGORY, 'TREE_LEAF': CATEGORY,
+    'TREE_LEAF_AGE': CATEGORY, 'LEAFTRAIT_LAB': CATEGORY,
+}
+
+
+@profiled('apply_schema', rows_in_arg=0)
+def apply_schema(df, schema):
+    for column, dtype in schema.items():
+        if column in df.columns:
+            df[column] = df[column].astype(dtype)
+    return df
+
+
+@profiled('plot_key', rows_in_arg=0)
+def plot_key(site, site_plot):
+    """
+    Categorical SITE + '_' + SITE_PLOT built from the category codes: only the distinct
+    (site, plot) pairs are concatenated as strings. Categories are sorted like the string keys would be.
+    """
+    site, site_plot = site.astype(CATEGORY), site_plot.astype(CATEGORY)
+    width = len(site_plot.cat.categories)
+    site_codes, plot_codes = site.cat.codes.to_numpy('int64'), site_plot.cat.codes.to_numpy('int64')
+    pairs = np.where((site_codes < 0) | (plot_codes < 0), -1, site_codes * width + plot_codes)
+    codes, uniques = pd.factorize(pairs, use_na_sentinel=False)
+    labels = (site.cat.categories[uniques // width].astype(str) + '_'
+              + site_plot.cat.categories[uniques % width].astype(str))
+    labels = np.asarray(labels, dtype=object)
+    valid = uniques >= 0
+    order = np.argsort(labels[valid], kind='stable')
+    remap = np.full(len(uniques), -1, dtype='int64')
+    remap[np.flatnonzero(valid)[order]] = np.arange(valid.sum())
+    categorical = pd.Categorical.from_codes(remap[codes], categories=labels[valid][order])
+    return pd.Series(categorical, index=site.index)
+
+
+# ---------------  Parsing (runs once per source file version)  ------------
+
+def _parse_pai(path):
+    with stage('read_csv') as measured:
+        df = measured.output(pd.read_csv(path, delimiter='\t',
+                                         dtype={'SITE_PLOT': str, 'MEAS_TIME': str, 'BAD_READINGS': str}))
+    df['MEAS_DATETIME'] = build_timestamps(df['MEAS_DATE'], df['MEAS_TIME'])
+    df = apply_schema(df, PAI_SCHEMA)
+    df['PLOT'] = plot_key(df['SITE'], df['SITE_PLOT'])  # Plot identifier shared by all scripts
+    return df
+
+
+def clean_soil_moisture(df):
+    """Numeric value columns and MEAS_DATETIME for a frame read with SOIL_MOISTURE_CSV_OPTIONS."""
+    with stage('decimal_conversion', rows_in=len(df)):
+        for column in SOIL_MOISTURE_VALUE_COLUMNS:
+            df[column] = pd.to_numeric(df[column], errors='coerce')
+    df['MEAS_DATETIME'] = build_timestamps(df['MEAS_DATE'], df['MEAS_TIME'])
+    return df
+
+
+def _parse_soil_moisture(path):
+    with stage('read_csv') as measured:  # Decimal commas are converted by the reader
+        df = measured.output(pd.read_csv(path, **SOIL_MOISTURE_CSV_OPTIONS))
+    df = apply_schema(clean_soil_moisture(df), SOIL_MOISTURE_SCHEMA)
+    df['PLOT'] = plot_key(df['SITE'], df['SITE_PLOT'])
+    return df
+
+
+def _parse_leaf_traits(path):
+    with stage('read_csv') as measured:
+        df = measured.output(pd.read_csv(path, delimiter='\t',
+                                         dtype={'SITE_PLOT': str, 'SAMPLING_TIME': str, 'TREE': str, 'TREE_LEAF_AGE': str}))
+    df['SAMPLING_DATETIME'] = build_timestamps(df['SAMPLING_DATE'])
+    df = apply_schema(df, LEAF_TRAITS_SCHEMA)
+    df['PLOT'] = plot_key(df['SITE'], df['SITE_PLOT'])
+    return df
+
+
+# ---------------  Arrow cache  ------------
+
+def source_fingerprint(path):
+    """Cache key for a source file, built from its absolute path, size and modification time."""
+    stat = os.stat(path)
+    key = f'{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}'
+    return hashlib.sha1(key.encode()).hexdigest()[:16]
+
+
+def cache_path(path, cache_dir=None):
+    """
+    <name>.<source>.v<version>.<fingerprint>.arrow, where <source> hashes the absolute path, so
+    campaigns with the same file names can share a cache directory.
+    """
+    stem = os.path.splitext(os.path.basename(path))[0]
+    source = hashlib.sha1(os.path.abspath(path).encode()).hexdigest()[:8]
+    cache_dir = cache_dir or os.environ.get('SENTHYMED_CACHE_DIR', CACHE_DIR)
+    return os.path.join(cache_dir, f'{stem}.{source}.v{CACHE_VERSION}.{source_fingerprint(path)}.arrow')
+
+
+def _write_cache(df, target):
+    cache_dir = os.path.dirname(target)
+    os.makedirs(cache_dir, exist_ok=True)
+    stem = os.path.basename(target).rsplit('.', 3)[0]  # <name>.<source>
+    # Drop the caches of older versions of the same source file. The current one is never removed,
+    # since another process may have it memory-mapped (unlinking a mapped older version is safe on POSIX).
+    for name in os.listdir(cache_dir):
+        if name.startswith(stem + '.') and name.endswith('.arrow') and name != os.path.basename(target):
+            with contextlib.suppress(OSError):  # Another process may have pruned it first
+                os.remove(os.path.join(cache_dir, name))
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    # A temporary file per writer, so concurrent cold loads of the same source never write to the same file
+    fd, tmp = tempfile.mkstemp(dir=cache_dir, prefix=os.path.basename(target) + '.', suffix='.tmp')
+    os.close(fd)
+    try:
+        with pa.OSFile(tmp, 'wb') as sink, ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        os.replace(tmp, target)  # Atomic, so a concurrent reader never sees a half-written cache
+    except OSError:
+        with contextlib.suppress(OSError):
+            os.remove(tmp)
+        if not os.path.exists(target):  # Fine if a concurrent writer produced the same cache
+            raise
+
+
+def _read_cache(target, columns=None):
+    # Uncompressed Arrow IPC files are memory-mapped: buffers are paged in from the file, not read up front
+    with pa.memory_map(target, 'r') as source:
+        table = ipc.open_file(source).read_all()
+    if columns is not None:
+        table = table.select(columns)
+    return table.to_pandas()
+
+
+def load_table(path, parser, columns=None, use_cache=True, cache_dir=None):
+    """Parse a tab-delimited source file once and serve later loads from its Arrow cache."""
+    if not use_cache or pa is None:
+        with stage('parse'):
+            df = parser(path)
+        return df[columns] if columns is not None else df
+
+    target = cache_path(path, cache_dir)
+    if not os.path.exists(target):
+        with stage('parse'):
+            df = parser(path)
+        with stage('cache_write', rows_in=len(df)):
+            _write_cache(df, target)
+    with stage('cache_read') as measured:
+        return measured.output(_read_cache(target, columns))
+
+
+# ---------------  Public loaders  ------------
+
+@profiled('load_pai')
+def load_pai(path=PAI_DATA_PATH, drop_bad_readings=True, **kwargs):
+    """Canopy PAI readings with MEAS_DATETIME and PLOT columns."""
+    columns = kwargs.get('columns')
+    if drop_bad_readings and columns is not None and 'BAD_READINGS' not in columns:
+        kwargs['columns'] = list(columns) + ['BAD_READINGS']
+    df = load_table(path, _parse_pai, **kwargs)
+    if drop_bad_readings:
+        df = df[df['BAD_READINGS'] != 'ERROR'].reset_index(drop=True)  # Filter out bad readings
+    return df[columns] if columns is not None else df
+
+
+@profiled('load_soil_moisture')
+def load_soil_moisture(path=SOIL_MOISTURE_DATA_PATH, **kwargs):
+    """Soil moisture readings with numeric value columns, MEAS_DATETIME and PLOT."""
+    return load_table(path, _parse_soil_moisture, **kwargs)
+
+
+@profiled('load_leaf_traits')
+def load_leaf_traits(path=LEAF_TRAITS_DATA_PATH, **kwargs):
+    """Leaf trait samples with SAMPLING_DATETIME and PLOT columns."""
+    return load_table(path, _parse_leaf_traits, **kwargs)
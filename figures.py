@@ -0,0 +1,201 @@
+import matplotlib.dates as mdates
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+import seaborn as sns
+
+from rendering import lttb_indices
+
+# Every function draws one figure from the data it is given and returns it, so it can run in a render worker.
+
+
+def _downsample(frame, x, y, max_points):
+    return frame.iloc[lttb_indices(frame[x], frame[y], max_points)] if max_points else frame
+
+
+# ---------------  fire_risk.py  ------------
+
+def pai_moisture_trend(pai_daily, soil_moisture_daily, max_points=None):
+    pai_daily = _downsample(pai_daily, 'Date', 'PAI', max_points)
+    soil_moisture_daily = _downsample(soil_moisture_daily, 'Date', 'Volumetric soil moisture', max_points)
+
+    fig, ax1 = plt.subplots()
+    color = 'tab:green'
+    ax1.set_xlabel('Date', fontsize = 15)
+    ax1.set_ylabel('PAI', color=color, fontsize = 15)
+    ax1.plot(pd.to_datetime(pai_daily['Date']), pai_daily['PAI'])
+    ax1.tick_params(axis='y', labelcolor=color)
+    ax2 = ax1.twinx()  # instantiate a second axes that shares the same x-axis
+    color = 'tab:brown'
+    ax2.set_ylabel('Volumetric Soil Moisture', color=color, fontsize = 15)
+    ax2.plot(pd.to_datetime(soil_moisture_daily['Date']), soil_moisture_daily['Volumetric soil moisture'], color=color)
+    ax2.tick_params(axis='y', labelcolor=color)
+    ax1.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m-%d'))
+    ax1.xaxis.set_major_locator(mdates.DayLocator(interval=15))  # Adjust interval as needed
+    ax1.set_title('Relationship Between Volumetric Soil Moisture and PAI', fontsize = 16)
+    fig.autofmt_xdate()  # Auto format the x-axis labels to fit them better
+    fig.tight_layout()  # otherwise the right y-label is slightly clipped
+    return fig
+
+
+def pai_risk_histogram(pai_df):
+    fig, ax = plt.subplots(figsize=(10, 6))
+    pai_df[pai_df['Risk_Level'] == 'High']['PAI'].hist(ax=ax, alpha=0.5, color='red', label='High Risk PAI')
+    pai_df[pai_df['Risk_Level'] == 'Low']['PAI'].hist(ax=ax, alpha=0.5, color='green', label='Low Risk PAI')
+    ax.set_title('Distribution of PAI by Risk Level', fontsize = 20)
+    ax.set_xlabel('PAI', fontsize = 15)
+    ax.set_ylabel('Frequency', fontsize = 15)
+    ax.legend(fontsize = 15)
+    return fig
+
+
+def risk_levels_bar(risk_levels):
+    fig, ax = plt.subplots()
+    risk_levels.plot(kind='bar', ax=ax, color=['orange', 'red', 'green'])
+    ax.set_title('Fire Risk Levels Based on PAI and Average Soil Moisture', fontsize = 15)
+    ax.set_xlabel('Risk Level', fontsize = 12)
+    ax.set_ylabel('Count', fontsize = 12)
+    plt.setp(ax.get_xticklabels(), rotation=45, ha='right', fontsize = 15)
+    fig.tight_layout()
+    return fig
+
+
+# ---------------  pai_analysis.py  ------------
+
+def mean_plot_pai(grouped_pai):
+    fig, ax = plt.subplots(figsize=(12, 6))
+    for plot, group in grouped_pai.groupby('PLOT', observed=True):
+        ax.plot(group['MEAS_DATE'], group['PAI'], '-o', label=plot)
+
+    # Formatting the date on the x-axis
+    ax.xaxis.set_major_formatter(mdates.DateFormatter('%m/%d/%Y'))
+    plt.setp(ax.get_xticklabels(), rotation=45, fontsize=12)
+    plt.setp(ax.get_yticklabels(), fontsize=12)
+    ax.set_title('Mean Plot Effective PAI over 2021',fontsize = 20)
+    ax.set_xlabel('Date (dd/mm/yyyy)', fontsize = 12)
+    ax.set_ylabel('Mean Plot Effective PAI (m²/m²)', fontsize = 12)
+    ax.legend(title='Plot', bbox_to_anchor=(1.05, 1), loc='upper left')
+    ax.grid(True)
+    fig.tight_layout()
+    return fig
+
+
+def monthly_pai_stripplot(grouped_pai):
+    fig, ax = plt.subplots(figsize=(12, 6))
+
+    # Create a dot plot using 'month_name' instead of 'month_str'
+    sns.stripplot(x='month_name', y='PAI', hue='PLOT', data=grouped_pai, ax=ax, jitter=True,
+                  dodge=True,  # Separate points for each 'PLOT' by dodging
+                  marker='o',
+                  palette='Set1',  # Use a predefined color palette
+                  alpha=0.7)   # Set transparency to make overlapping points more visible
+
+    plt.setp(ax.get_xticklabels(), rotation=45, ha="right", fontsize=12)
+    plt.setp(ax.get_yticklabels(), fontsize=12)
+    ax.set_title('Monthly PAI Distribution by Plot', fontsize=20)
+    ax.set_xlabel('Month', fontsize=14)
+    ax.set_ylabel('PAI (m²/m²)', fontsize=14)
+    ax.legend(title='Plot', bbox_to_anchor=(1.05, 1), loc='upper left', fontsize=12)
+    fig.tight_layout()
+    return fig
+
+
+# ---------------  soil_moisture_analysis.py  ------------
+
+def moisture_scatter_by_day(soil_moisture, max_points=None):
+    # Categories of all rows, so colors don't depend on downsampling
+    plot_ids = soil_moisture['SITE_PLOT'].astype('category').cat.remove_unused_categories()
+    soil_moisture = _downsample(soil_moisture.assign(SITE_PLOT=plot_ids), 'days_since_start', 'Volumetric soil moisture', max_points)
+    plot_ids = soil_moisture['SITE_PLOT']
+
+    fig, ax = plt.subplots(figsize=(15, 10))
+    scatter = ax.scatter(soil_moisture['days_since_start'], soil_moisture['Volumetric soil moisture'],
+                         c=plot_ids.cat.codes, cmap='viridis')
+    # Create a colorbar with plot ID labels
+    cbar = fig.colorbar(scatter, ax=ax, ticks=range(len(plot_ids.cat.categories)))
+    cbar.set_ticklabels(plot_ids.cat.categories)
+    cbar.set_label('Plot ID')
+    ax.set_title('Scatter Plot of Soil Moisture Measurements for All Plots', fontsize=20)
+    ax.set_xlabel('Days Since Start of Measurement', fontsize = 15)
+    ax.set_ylabel('Volumetric Soil Moisture (%)', fontsize = 15)
+    plt.setp(ax.get_xticklabels(), rotation=45, fontsize = 12)
+    plt.setp(ax.get_yticklabels(), fontsize=12)
+    ax.grid(True)
+    fig.tight_layout()
+    return fig
+
+
+def spatial_moisture_map(soil_moisture_map):
+    fig, ax = plt.subplots(figsize=(10, 6))
+    soil_moisture_map.plot(column='Volumetric soil moisture', ax=ax, legend=True)
+    ax.set_title('Spatial Distribution of Soil Moisture Measurements', fontsize=18)
+    # Setting axis labels
+    ax.set_xlabel('Longitude', fontsize=15)
+    ax.set_ylabel('Latitude', fontsize=15)
+    plt.setp(ax.get_xticklabels(), fontsize=12)
+    plt.setp(ax.get_yticklabels(), fontsize=12)
+    return fig
+
+
+def moisture_by_location(soil_moisture_merge):
+    # Mapping from SITE_PLOT_code to color
+    num_unique_plots = soil_moisture_merge['SITE_PLOT'].nunique() # Number of unique SITE_PLOT values
+    colors = plt.cm.viridis(np.linspace(0, 1, num_unique_plots)) # Generate a list of colors from a colormap
+    color_map = {code: colors[i] for i, code in enumerate(soil_moisture_merge['SITE_PLOT_codes'].unique())}
+
+    fig, ax = plt.subplots(figsize=(12, 8))
+    scatter_colors = soil_moisture_merge['SITE_PLOT_codes'].map(color_map) # Apply the color map
+    ax.scatter(soil_moisture_merge['SITE_PLOT_codes'], soil_moisture_merge['Volumetric soil moisture'], color=scatter_colors)
+    ax.set_xticks(soil_moisture_merge['SITE_PLOT_codes'].unique(), labels=soil_moisture_merge['SITE_PLOT'].unique(), rotation=90)
+    ax.set_xlabel('Location (SITE PLOT)', fontsize = 15)
+    ax.set_ylabel('Volumetric Soil Moisture (%)', fontsize = 15)
+    ax.set_title('Volumetric Soil Moisture Measurements by Location',fontsize=20)
+    ax.grid(True)
+    plt.setp(ax.get_xticklabels(), fontsize=12)
+    plt.setp(ax.get_yticklabels(), fontsize=12)
+    fig.tight_layout()
+    return fig
+
+
+def daily_moisture_temperature(daily_data, max_points=None):
+    moisture = _downsample(daily_data, 'MEAS_DATE', 'Volumetric soil moisture', max_points)
+    temperature = _downsample(daily_data, 'MEAS_DATE', 'Soil temperature', max_points)
+
+    fig, ax1 = plt.subplots(figsize=(10, 6))
+    color = 'tab:red'
+    ax1.set_xlabel('Date', fontsize = 15)
+    ax1.set_ylabel('Volumetric Soil Moisture (%)', color=color, fontsize = 15)
+    ax1.plot(moisture['MEAS_DATE'], moisture['Volumetric soil moisture'], color=color)
+    ax1.tick_params(axis='y', labelcolor=color)
+    ax2 = ax1.twinx()   # Instantiate a second axes that shares the same x-axis
+    color = 'tab:blue'
+    ax2.set_ylabel('Soil Temperature (°C)', color=color, fontsize=15)
+    ax2.plot(temperature['MEAS_DATE'], temperature['Soil temperature'], color=color)
+    ax2.tick_params(axis='y', labelcolor=color)
+    fig.subplots_adjust(top=0.85)
+    fig.tight_layout()  # to make sure there's no overlap
+    fig.suptitle('Daily Average Soil Moisture and Temperature', y=0.97, fontsize=16)
+    plt.setp(ax2.get_xticklabels(), fontsize=12)
+    plt.setp(ax2.get_yticklabels(), fontsize=12)
+    return fig
+
+
+# ---------------  pai_analysis _from_doc.py  ------------
+
+def values_over_time(dates, values, rolling_mean, title, ylabel, rolling_label='7-Day Rolling Mean', max_points=None):
+    raw = _downsample(pd.DataFrame({'date': dates, 'value': values}), 'date', 'value', max_points)
+    # One line through time: rolling means of rows sharing a date (several plots) are averaged
+    trend = pd.DataFrame({'date': dates, 'value': rolling_mean}).groupby('date', sort=True)['value'].mean().reset_index()
+    trend = _downsample(trend, 'date', 'value', max_points)
+
+    fig, ax = plt.subplots(figsize=(12, 6))
+    ax.scatter(raw['date'], raw['value'], s=10, label='Raw Data')
+    ax.plot(trend['date'], trend['value'], color='red', label=rolling_label)
+    ax.set_title(title, fontsize=20)
+    ax.set_xlabel('Date', fontsize=15)
+    ax.set_ylabel(ylabel, fontsize=15)
+    ax.legend()
+    plt.setp(ax.get_xticklabels(), fontsize=12)
+    plt.setp(ax.get_yticklabels(), fontsize=12)
+    fig.tight_layout()
+    return fig
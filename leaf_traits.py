@@ -0,0 +1,66 @@
+from data_loader import build_timestamps, load_leaf_traits, plot_key
+from plot_join import asof_plot_join
+from profiling import profiled
+
+
+# Equivalent water thickness (g/cm²) and leaf mass per area (g/cm²), measured in the lab and retrieved by PROSPECT
+TRAIT_COLUMNS = ['EWT_LAB', 'EWT_PROSPECT', 'LMA_LAB', 'LMA_PROSPECT']
+FEATURE_COLUMNS = TRAIT_COLUMNS + ['LFMC_LAB', 'LFMC_PROSPECT']
+GROUP_KEYS = ['SITE', 'SITE_PLOT', 'SAMPLING_DATE']
+UNKNOWN_AGE = 'U'
+
+
+def add_fuel_moisture(leaf_df):
+    """Live fuel moisture content per leaf, LFMC = EWT / LMA * 100 (% of dry mass)."""
+    return leaf_df.assign(LFMC_LAB=leaf_df['EWT_LAB'] / leaf_df['LMA_LAB'] * 100,
+                          LFMC_PROSPECT=leaf_df['EWT_PROSPECT'] / leaf_df['LMA_PROSPECT'] * 100)
+
+
+@profiled('leaf_fuel_features', rows_in_arg=0)
+def leaf_fuel_features(leaf_df, by_species=True, by_leaf_age=True):
+    """
+    Mean fuel-moisture traits per (SITE, SITE_PLOT, SAMPLING_DATE), one row per plot visit.
+    Plot-level means come first; the species and leaf-age breakdowns follow as extra columns
+    named like LFMC_LAB_QI, LFMC_LAB_Y or LFMC_LAB_QI_Y (leaf age Y/O, U when not recorded).
+    The frame also carries the PLOT and Date keys used by fire_risk.py.
+    """
+    leaf_df = add_fuel_moisture(leaf_df)
+    leaf_age = leaf_df['TREE_LEAF_AGE'].astype('category')
+    if UNKNOWN_AGE not in leaf_age.cat.categories:
+        leaf_age = leaf_age.cat.add_categories(UNKNOWN_AGE)
+    leaf_df = leaf_df.assign(TREE_LEAF_AGE=leaf_age.fillna(UNKNOWN_AGE))
+
+    grouped = leaf_df.groupby(GROUP_KEYS, observed=True)
+    features = grouped[FEATURE_COLUMNS].mean()
+    features['N_TREES'] = grouped['TREE'].nunique()
+
+    breakdowns = []
+    if by_species:
+        breakdowns.append(['SPECIES'])
+    if by_leaf_age:
+        breakdowns.append(['TREE_LEAF_AGE'])
+    if by_species and by_leaf_age:
+        breakdowns.append(['SPECIES', 'TREE_LEAF_AGE'])
+    for columns in breakdowns:
+        wide = leaf_df.groupby(GROUP_KEYS + columns, observed=True)[FEATURE_COLUMNS].mean().unstack(columns)
+        wide.columns = ['_'.join(map(str, column)) for column in wide.columns.to_flat_index()]
+        features = features.join(wide)
+
+    features = features.reset_index()
+    features['PLOT'] = plot_key(features['SITE'], features['SITE_PLOT'])
+    features['Date'] = build_timestamps(features['SAMPLING_DATE'])
+    return features
+
+
+def join_leaf_features(plot_day_table, features, columns=('LFMC_LAB', 'LFMC_PROSPECT', 'EWT_LAB', 'LMA_LAB'),
+                       tolerance='15D'):
+    """Attach the nearest leaf sampling of the same plot to a (PLOT, Date) table in one as-of join."""
+    table = plot_day_table.reset_index()
+    joined = asof_plot_join(table, features, 'Date', list(columns), tolerance=tolerance, matched_on='Leaf_Date')
+    return joined.set_index(['PLOT', 'Date']).sort_index()
+
+
+if __name__ == '__main__':
+    features = leaf_fuel_features(load_leaf_traits())
+    print("Leaf Fuel-Moisture Features per Plot Visit:")
+    print(features[['PLOT', 'Date', 'N_TREES'] + FEATURE_COLUMNS].to_string(index=False))
@@ -1,48 +1,47 @@
-import pandas as pd
-import matplotlib.pyplot as plt
+import figures
+from data_loader import load_pai, load_soil_moisture
+from rendering import figure, max_points, render_pending
+from rolling_engine import rolling_plot_stats
 
-# Load the data
-soil_moisture_data = pd.read_csv('SENTHYMED_MEDOAK_soil_moisture_data.txt', delimiter='\t')
-pai_data = pd.read_csv('SENTHYMED_MEDOAK_canopy_plant_area_index_data.txt', delimiter='\t')
+# Load the data (numeric conversion of the soil moisture values is done by the loader)
+soil_moisture_data = load_soil_moisture()
+pai_data = load_pai(drop_bad_readings=False)
 
-# Data cleaning and type conversion
-soil_moisture_data['Volumetric soil moisture'] = soil_moisture_data['Volumetric soil moisture'].str.replace(',', '.').astype(float)
-soil_moisture_data['MEAS_DATE'] = pd.to_datetime(soil_moisture_data['MEAS_DATE'], format='%Y%m%d')
-pai_data['MEAS_DATE'] = pd.to_datetime(pai_data['MEAS_DATE'], format='%Y%m%d')
+# Date-only columns for plotting
+soil_moisture_data['MEAS_DATE'] = soil_moisture_data['MEAS_DATETIME'].dt.normalize()
+pai_data['MEAS_DATE'] = pai_data['MEAS_DATETIME'].dt.normalize()
 
 
 # -----------  Set up the plots  --------------
 
+# Rolling means over real time windows centered on each reading, computed within each plot
+# (7 days for the plots, 30 days for the soil drying trend below)
+soil_moisture_trends = rolling_plot_stats(soil_moisture_data, ['Volumetric soil moisture'], windows=('7D', '30D'))
+pai_trends = rolling_plot_stats(pai_data, ['PAI'], windows=('7D',))
+
 # Plot Soil Moisture with Rolling Mean
-plt.figure(figsize=(12, 6))
-plt.scatter(soil_moisture_data['MEAS_DATE'], soil_moisture_data['Volumetric soil moisture'], s=10, label='Raw Data')
-rolling_mean_soil_moisture = soil_moisture_data['Volumetric soil moisture'].rolling(window=7, center=True).mean()
-plt.plot(soil_moisture_data['MEAS_DATE'], rolling_mean_soil_moisture, color='red', label='7-Day Rolling Mean')
-plt.title('Soil Moisture Over Time', fontsize=20)
-plt.xlabel('Date', fontsize=15)
-plt.ylabel('Volumetric Soil Moisture', fontsize=15)
-plt.legend()
-plt.xticks(fontsize=12)
-plt.yticks(fontsize=12)
-plt.tight_layout()
-plt.show()
+rolling_mean_soil_moisture = soil_moisture_trends['Volumetric soil moisture_mean_7D']
+figure('soil_moisture_over_time', figures.values_over_time,
+       dates=soil_moisture_data['MEAS_DATE'], values=soil_moisture_data['Volumetric soil moisture'],
+       rolling_mean=rolling_mean_soil_moisture, title='Soil Moisture Over Time',
+       ylabel='Volumetric Soil Moisture', rolling_label='7-Day Rolling Mean (plot average)', max_points=max_points())
 
 # Plot PAI Over Time with Rolling Mean
-plt.figure(figsize=(12, 6))
-plt.scatter(pai_data['MEAS_DATE'], pai_data['PAI'], s=10, label='Raw Data')
-rolling_mean_pai = pai_data['PAI'].rolling(window=7, center=True).mean()
-plt.plot(pai_data['MEAS_DATE'], rolling_mean_pai, color='red', label='7-Day Rolling Mean')
-plt.title('PAI Over Time', fontsize = 20)
-plt.xlabel('Date',  fontsize=15)
-plt.ylabel('PAI', fontsize=15)
-plt.xticks(fontsize=12)
-plt.yticks(fontsize=12)
-plt.legend()
-plt.tight_layout()
-plt.show()
+rolling_mean_pai = pai_trends['PAI_mean_7D']
+figure('pai_over_time', figures.values_over_time,
+       dates=pai_data['MEAS_DATE'], values=pai_data['PAI'], rolling_mean=rolling_mean_pai,
+       title='PAI Over Time', ylabel='PAI', rolling_label='7-Day Rolling Mean (plot average)', max_points=max_points())
 
 # -------------   Descriptive statistics  ------------
 
 print("Soil Moisture Descriptive Statistics:\n", soil_moisture_data['Volumetric soil moisture'].describe())
 print("PAI Descriptive Statistics:\n", pai_data['PAI'].describe())
 
+# Drying trend: 7-day minus 30-day mean soil moisture at each plot's last reading (negative means drying)
+latest = soil_moisture_data.join(soil_moisture_trends).sort_values('MEAS_DATETIME').groupby('PLOT', observed=True).tail(1)
+drying_trend = (latest['Volumetric soil moisture_mean_7D'] - latest['Volumetric soil moisture_mean_30D']).set_axis(latest['PLOT'])
+print("Soil Moisture 7-Day minus 30-Day Mean at the Last Reading per Plot:\n", drying_trend.sort_index())
+
+# Headless mode: render all queued figures in parallel
+render_pending()
+
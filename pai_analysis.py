@@ -1,42 +1,28 @@
 import pandas as pd
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
-import seaborn as sns
 
-# ---------------  Load and set up the data  ------------
-# Load the PAI data
-pai_data_path = 'SENTHYMED_MEDOAK_canopy_plant_area_index_data.txt'
-pai_df = pd.read_csv(pai_data_path, delimiter='\t')  # Adjust delimiter if necessary
+import figures
+from data_loader import load_pai
+from profiling import stage
+from rendering import figure, render_pending
 
-# Filter out bad readings (assuming 'BAD_READINGS' column indicates them)
-pai_df = pai_df[pai_df['BAD_READINGS'] != 'ERROR']
+# ---------------  Load and set up the data  ------------
+# Load the PAI data (bad readings removed and PLOT identifier added by the loader)
+pai_df = load_pai()
 
 # Convert MEAS_DATE to datetime format for easier handling of dates
-pai_df['MEAS_DATE'] = pd.to_datetime(pai_df['MEAS_DATE'], format='%Y%m%d')
-
-# Remove bad readings
-pai_df = pai_df[pai_df['BAD_READINGS'].isnull()]
-
-# Create a new column to differentiate plots in PSL and PUE
-pai_df['PLOT'] = pai_df['SITE'] + '_' + pai_df['SITE_PLOT']
+pai_df['MEAS_DATE'] = pai_df['MEAS_DATETIME'].dt.normalize()
 
 
 # --------- Preliminary data processing -------------
 
 # Group by new plot identifier and date, then calculate mean PAI, excluding repetitions
-grouped_pai = pai_df.groupby(['PLOT', pai_df['MEAS_DATE'].dt.to_period('M')])['PAI'].mean().reset_index()
+with stage('monthly_period_means', rows_in=len(pai_df)) as measured:
+    grouped_pai = pai_df.groupby(['PLOT', pai_df['MEAS_DATE'].dt.to_period('M')], observed=True)['PAI'].mean().reset_index()
+    measured.output(grouped_pai)
 
 # Convert MEAS_DATE from Period to datetime for plotting
 grouped_pai['MEAS_DATE'] = grouped_pai['MEAS_DATE'].dt.to_timestamp()
 
-# Plotting the Mean of Pai 
-fig, ax = plt.subplots(figsize=(12, 6))
-for plot, group in grouped_pai.groupby('PLOT'):
-    ax.plot(group['MEAS_DATE'], group['PAI'], '-o', label=plot)
-    plt.xticks(rotation=45, fontsize=12)
-    plt.yticks(fontsize=12)
-
-
 # -------------   Descriptive statistics for PAI ------------
     
 # Summary Statistics of PAI Values:
@@ -45,24 +31,17 @@ print(pai_df['PAI'].describe())
 
 
 # -----------  Set up the plot  --------------
-    
-# Formatting the date on the x-axis
-ax.xaxis.set_major_formatter(mdates.DateFormatter('%m/%d/%Y'))
-plt.xticks(rotation=45, fontsize=12)
-plt.yticks(fontsize=12)
-ax.set_title('Mean Plot Effective PAI over 2021',fontsize = 20)
-ax.set_xlabel('Date (dd/mm/yyyy)', fontsize = 12)
-ax.set_ylabel('Mean Plot Effective PAI (m²/m²)', fontsize = 12)
-plt.legend(title='Plot', bbox_to_anchor=(1.05, 1), loc='upper left')
-plt.grid(True)
-plt.tight_layout()
-plt.show()
+
+# Plotting the Mean of Pai 
+figure('pai_mean_by_plot', figures.mean_plot_pai, grouped_pai=grouped_pai)
 
 
 # Ensure grouping by 'PLOT' and then resampling monthly on 'MEAS_DATE'
 # This avoids setting 'MEAS_DATE' as an index before resampling
 pai_df.set_index('MEAS_DATE', inplace=True)
-grouped_pai = pai_df.groupby('PLOT').resample('M')['PAI'].mean().reset_index()
+with stage('monthly_resample', rows_in=len(pai_df)) as measured:
+    grouped_pai = pai_df.groupby('PLOT', observed=True).resample('M')['PAI'].mean().reset_index()
+    measured.output(grouped_pai)
 grouped_pai['MEAS_DATE'] = pd.to_datetime(grouped_pai['MEAS_DATE'])
 
 # Extract month numbers and map them to month names
@@ -76,7 +55,7 @@ grouped_pai['month_name'] = grouped_pai['month'].map(month_map)
 
 
 # Comparison of Plots:
-plot_averages = grouped_pai.groupby('PLOT')['PAI'].mean().sort_values(ascending=False)
+plot_averages = grouped_pai.groupby('PLOT', observed=True)['PAI'].mean().sort_values(ascending=False)
 print("\nAverage PAI by Plot (Descending Order):")
 print(plot_averages)
 
@@ -85,21 +64,8 @@ print(plot_averages)
 
 
 # Plotting the monthly PAI distribution with month names
-fig, ax = plt.subplots(figsize=(12, 6))
-
-# Create a dot plot using 'month_name' instead of 'month_str'
-sns.stripplot(x='month_name', y='PAI', hue='PLOT', data=grouped_pai, ax=ax, jitter=True,
-              dodge=True,  # Separate points for each 'PLOT' by dodging
-              marker='o',  
-              palette='Set1',  # Use a predefined color palette
-              alpha=0.7)   # Set transparency to make overlapping points more visible
-
-plt.xticks(rotation=45, ha="right", fontsize=12)
-plt.yticks(fontsize=12)
-ax.set_title('Monthly PAI Distribution by Plot', fontsize=20)
-ax.set_xlabel('Month', fontsize=14)
-ax.set_ylabel('PAI (m²/m²)', fontsize=14)
-plt.legend(title='Plot', bbox_to_anchor=(1.05, 1), loc='upper left', fontsize=12)
-plt.tight_layout()
-plt.show()
+figure('pai_monthly_distribution', figures.monthly_pai_stripplot, grouped_pai=grouped_pai)
+
+# Headless mode: render all queued figures in parallel
+render_pending()
 
@@ -0,0 +1,58 @@
+import pandas as pd
+
+from profiling import profiled
+
+
+DEFAULT_TOLERANCE = '3D'
+SOIL_MOISTURE_COLUMN = 'Volumetric soil moisture'
+
+
+def daily_plot_means(df, value_columns, time_column='MEAS_DATETIME'):
+    """Mean of each value column per (PLOT, Date), sorted by Date for as-of joins."""
+    daily = (df.assign(Date=df[time_column].dt.normalize())
+               .groupby(['PLOT', 'Date'], observed=True, sort=False)[value_columns].mean()
+               .reset_index())
+    return daily.sort_values('Date', kind='stable', ignore_index=True)
+
+
+def _align_plot_keys(left, right):
+    """merge_asof needs identical `by` dtypes; categorical PLOT keys are recoded onto the union of both categories."""
+    left_dtype, right_dtype = left['PLOT'].dtype, right['PLOT'].dtype
+    if left_dtype == right_dtype:
+        return left, right
+    if isinstance(left_dtype, pd.CategoricalDtype) and isinstance(right_dtype, pd.CategoricalDtype):
+        dtype = pd.CategoricalDtype(left_dtype.categories.union(right_dtype.categories))
+    else:
+        dtype = object
+    return left.assign(PLOT=left['PLOT'].astype(dtype)), right.assign(PLOT=right['PLOT'].astype(dtype))
+
+
+@profiled('asof_plot_join', rows_in_arg=0)
+def asof_plot_join(left, right, on, right_columns, tolerance=DEFAULT_TOLERANCE, direction='nearest',
+                   matched_on=None):
+    """
+    Attach to every left row the nearest-in-time right row of the same PLOT.
+    Both inputs are sorted once on `on`; the merge itself is a linear sweep, so memory stays O(len(left)).
+    """
+    left = left.sort_values(on, kind='stable', ignore_index=True)
+    right = right[['PLOT', on] + list(right_columns)]
+    if matched_on is not None:
+        right = right.assign(**{matched_on: right[on]})
+    right = right.sort_values(on, kind='stable', ignore_index=True)
+    left, right = _align_plot_keys(left, right)
+    return pd.merge_asof(left, right, on=on, by='PLOT', direction=direction,
+                         tolerance=pd.Timedelta(tolerance))
+
+
+@profiled('plot_day_index', rows_in_arg=0)
+def plot_day_index(pai_df, soil_moisture_df, tolerance=DEFAULT_TOLERANCE, direction='nearest'):
+    """
+    Compact (PLOT, Date) table of daily mean PAI joined to the nearest daily mean soil moisture of the same plot.
+    Plot-days with no moisture reading within `tolerance` keep NaN moisture.
+    """
+    pai_daily = daily_plot_means(pai_df, ['PAI'])
+    moisture_daily = daily_plot_means(soil_moisture_df, [SOIL_MOISTURE_COLUMN])
+    joined = asof_plot_join(pai_daily, moisture_daily, 'Date', [SOIL_MOISTURE_COLUMN],
+                            tolerance=tolerance, direction=direction, matched_on='Moisture_Date')
+    joined['Moisture_Lag_Days'] = (joined['Date'] - joined['Moisture_Date']).dt.days
+    return joined.set_index(['PLOT', 'Date']).sort_index()
@@ -0,0 +1,84 @@
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
+from shapely import STRtree
+
+from profiling import profiled, stage
+
+
+SOIL_MOISTURE_SHAPEFILE = 'SENTHYMED_MEDOAK_soil_moisture_coord_P.shp'
+SOURCE_CRS = 'EPSG:32633'  # UTM 33N, metres
+MAP_CRS = 'EPSG:4326'
+
+
+class PlotRegistry:
+    """
+    Unique measurement locations keyed by a dense integer LOC_KEY, with an STRtree over their geometry.
+    Queries run in the metric source CRS; each location is reprojected at most once per target CRS.
+    """
+
+    def __init__(self, locations, crs=SOURCE_CRS):
+        locations = locations.drop_duplicates('ID_LOC').reset_index(drop=True)
+        self.crs = crs
+        self.id_locs = pd.Index(locations['ID_LOC'])
+        self.geometry = gpd.GeoSeries(locations.geometry.values, crs=crs)
+        self.tree = STRtree(self.geometry.values)
+        self._projected = {crs: self.geometry}
+
+    @classmethod
+    @profiled('read_shapefile')
+    def from_shapefile(cls, path=SOIL_MOISTURE_SHAPEFILE, source_crs=SOURCE_CRS):
+        locations = gpd.read_file(path)
+        if 'ID_LOC' not in locations.columns:
+            raise ValueError(f"{path} has no ID_LOC attribute (is the .dbf next to the .shp?)")
+        return cls(locations.set_crs(source_crs, allow_override=True), crs=source_crs)
+
+    def __len__(self):
+        return len(self.id_locs)
+
+    # ---------------  Keys  ------------
+
+    def keys_for(self, id_locs):
+        """LOC_KEY for each ID_LOC, -1 where the location is unknown."""
+        if isinstance(getattr(id_locs, 'dtype', None), pd.CategoricalDtype):
+            # Look up each category once and index the result by code (code -1, a missing ID_LOC, maps to -1)
+            category_keys = self.id_locs.get_indexer(id_locs.cat.categories)
+            return np.append(category_keys, -1).take(id_locs.cat.codes.to_numpy()).astype('int32')
+        return self.id_locs.get_indexer(pd.Index(id_locs)).astype('int32')
+
+    @profiled('attach_locations', rows_in_arg=1)
+    def attach(self, df, how='inner'):
+        """Add a LOC_KEY column to measurements; how='inner' drops rows whose location is not registered."""
+        keys = self.keys_for(df['ID_LOC'])
+        if how == 'inner':
+            df, keys = df[keys >= 0], keys[keys >= 0]
+        return df.assign(LOC_KEY=keys)
+
+    def projected(self, crs=MAP_CRS):
+        """Location geometries in `crs`, reprojected once and cached."""
+        if crs not in self._projected:
+            with stage('to_crs', rows_in=len(self.geometry)):
+                self._projected[crs] = self.geometry.to_crs(crs)
+        return self._projected[crs]
+
+    @profiled('to_geodataframe', rows_in_arg=1)
+    def to_geodataframe(self, df, crs=MAP_CRS):
+        """Measurements with a geometry column looked up by LOC_KEY (missing where LOC_KEY is -1), for plotting."""
+        geometry = self.projected(crs).values.take(df['LOC_KEY'].to_numpy(), allow_fill=True)
+        return gpd.GeoDataFrame(df, geometry=geometry, crs=crs)
+
+    # ---------------  Spatial queries (coordinates in the registry CRS)  ------------
+
+    def nearest(self, x, y):
+        """LOC_KEY of the location nearest to each (x, y)."""
+        points = shapely.points(np.asarray(x, dtype=float), np.asarray(y, dtype=float))
+        return self.tree.nearest(points)
+
+    def within_radius(self, x, y, radius):
+        """LOC_KEYs within `radius` (CRS units, metres by default) of (x, y)."""
+        return np.sort(self.tree.query(shapely.Point(x, y), predicate='dwithin', distance=radius))
+
+    def in_bbox(self, minx, miny, maxx, maxy):
+        """LOC_KEYs inside the bounding box."""
+        return np.sort(self.tree.query(shapely.box(minx, miny, maxx, maxy), predicate='intersects'))
@@ -0,0 +1,210 @@
+import atexit
+import functools
+import json
+import os
+import resource
+import sys
+import time
+import tracemalloc
+
+
+# ---------------  Settings (read from the environment at call time)  ------------
+# SENTHYMED_PROFILE          JSON report path; when unset, stages are not measured
+# SENTHYMED_PROFILE_STACKS   optional folded-stack file (flamegraph.pl / speedscope input), self time in microseconds
+# SENTHYMED_PROFILE_MEMORY   'rss' (default): growth of the process peak RSS during the stage;
+#                            'tracemalloc': peak Python/NumPy allocations above the stage's starting level (slower)
+# CPU time is this process only; work done in render or batch worker processes shows up as wall time.
+
+def report_path():
+    return os.environ.get('SENTHYMED_PROFILE')
+
+
+def enabled():
+    return report_path() is not None
+
+
+def stacks_path():
+    return os.environ.get('SENTHYMED_PROFILE_STACKS')
+
+
+def memory_mode():
+    return os.environ.get('SENTHYMED_PROFILE_MEMORY', 'rss')
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 ** 2 if sys.platform == 'darwin' else peak / 1024  # bytes on macOS, KiB on Linux
+
+
+def rows_of(value):
+    return len(value) if hasattr(value, '__len__') and not isinstance(value, (str, bytes)) else None
+
+
+# ---------------  Stages  ------------
+
+class _NullStage:
+    """Returned by stage() when profiling is off: entering, exiting and output() do nothing."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def output(self, result):
+        return result
+
+
+_NULL_STAGE = _NullStage()
+_records = []
+_stack = []
+_origin = None
+
+
+class Stage:
+    """One measured stage; nested stages record their parents' names as a stack."""
+
+    def __init__(self, name, rows_in=None):
+        self.name = name
+        self.rows_in = rows_in
+        self.rows_out = None
+
+    def output(self, result):
+        """Record the row count of a stage's result and pass it through."""
+        self.rows_out = rows_of(result)
+        return result
+
+    def __enter__(self):
+        _start_session()
+        self.stack = [stage.name for stage in _stack] + [self.name]
+        self.tracemalloc = memory_mode() == 'tracemalloc'
+        if self.tracemalloc:
+            current, peak = tracemalloc.get_traced_memory()
+            if _stack:
+                _stack[-1].memory_peak = max(_stack[-1].memory_peak, peak)
+            tracemalloc.reset_peak()
+            self.memory_start = self.memory_peak = current
+        else:
+            self.memory_start = peak_rss_mb()
+        self.child_seconds = 0.0
+        _stack.append(self)
+        self.start = time.perf_counter()
+        self.cpu_start = time.process_time()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self.start
+        cpu_seconds = time.process_time() - self.cpu_start
+        if self.tracemalloc:
+            self.memory_peak = max(self.memory_peak, tracemalloc.get_traced_memory()[1])
+            memory_delta = (self.memory_peak - self.memory_start) / 1024 ** 2
+        else:
+            memory_delta = peak_rss_mb() - self.memory_start
+        _stack.pop()
+        if _stack:
+            _stack[-1].child_seconds += seconds
+            if self.tracemalloc:
+                _stack[-1].memory_peak = max(_stack[-1].memory_peak, self.memory_peak)
+        _records.append({
+            'stage': self.name, 'stack': self.stack, 'start': round(self.start - _origin, 6),
+            'wall_seconds': round(seconds, 6), 'self_seconds': round(seconds - self.child_seconds, 6),
+            'cpu_seconds': round(cpu_seconds, 6), 'peak_memory_delta_mb': round(memory_delta, 3),
+            'rows_in': self.rows_in, 'rows_out': self.rows_out, 'failed': exc_type is not None,
+        })
+        return False
+
+
+def stage(name, rows_in=None):
+    """
+    Context manager measuring a named stage: `with stage('load', rows_in=n) as s: df = s.output(load())`.
+    When profiling is off this returns a shared no-op object, so an instrumented stage costs one env lookup.
+    """
+    if not enabled():
+        return _NULL_STAGE
+    return Stage(name, rows_in)
+
+
+def profiled(name=None, rows_in_arg=None):
+    """
+    Decorator form of stage(). rows_out is taken from the return value; rows_in from the positional
+    argument at index `rows_in_arg`, when given.
+    """
+    def decorate(function):
+        stage_name = name or function.__name__
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not enabled():
+                return function(*args, **kwargs)
+            rows_in = rows_of(args[rows_in_arg]) if rows_in_arg is not None and len(args) > rows_in_arg else None
+            with Stage(stage_name, rows_in) as measured:
+                return measured.output(function(*args, **kwargs))
+        return wrapper
+    return decorate
+
+
+# ---------------  Report  ------------
+
+def _start_session():
+    global _origin
+    if _origin is not None:
+        return
+    _origin = time.perf_counter()
+    if memory_mode() == 'tracemalloc' and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    atexit.register(write_report)
+
+
+def summarize(records):
+    """Totals per stage stack, in first-seen order."""
+    totals = {}
+    for record in records:
+        key = ';'.join(record['stack'])
+        total = totals.setdefault(key, {'stack': key, 'calls': 0, 'wall_seconds': 0.0, 'self_seconds': 0.0,
+                                        'cpu_seconds': 0.0, 'peak_memory_delta_mb': 0.0})
+        total['calls'] += 1
+        for field in ('wall_seconds', 'self_seconds', 'cpu_seconds'):
+            total[field] = round(total[field] + record[field], 6)
+        total['peak_memory_delta_mb'] = max(total['peak_memory_delta_mb'], record['peak_memory_delta_mb'])
+    return list(totals.values())
+
+
+def folded_stacks(records, root=None):
+    """Lines of `root;stage;substage <self microseconds>`, the input format of flamegraph.pl and speedscope."""
+    lines = []
+    for total in summarize(records):
+        stack = f"{root};{total['stack']}" if root else total['stack']
+        lines.append(f"{stack} {max(int(total['self_seconds'] * 1e6), 0)}")
+    return lines
+
+
+def write_report(path=None, stacks=None):
+    """Write the JSON report (and folded stacks, when configured) for every stage measured so far."""
+    path = path or report_path()
+    if path is None or not _records:
+        return None
+    script = os.path.basename(sys.argv[0]) if sys.argv and sys.argv[0] else 'python'
+    report = {'script': script, 'argv': sys.argv[1:], 'pid': os.getpid(), 'memory_mode': memory_mode(),
+              'peak_rss_mb': round(peak_rss_mb(), 1), 'stages': _records, 'summary': summarize(_records)}
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
+    stacks = stacks or stacks_path()
+    if stacks:
+        with open(stacks, 'w') as f:
+            f.write('\n'.join(folded_stacks(_records, root=script)) + '\n')
+    return path
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Print a profiling report as a table, slowest stages first.')
+    parser.add_argument('report')
+    args = parser.parse_args()
+    with open(args.report) as f:
+        report = json.load(f)
+    print(f"{report['script']} (peak RSS {report['peak_rss_mb']} MB, memory mode {report['memory_mode']})")
+    for total in sorted(report['summary'], key=lambda total: total['self_seconds'], reverse=True):
+        print(f"  {total['stack']:<50} {total['calls']:>4}x  wall {total['wall_seconds']:>9.4f} s  "
+              f"self {total['self_seconds']:>9.4f} s  cpu {total['cpu_seconds']:>9.4f} s  "
+              f"mem +{total['peak_memory_delta_mb']:.1f} MB")
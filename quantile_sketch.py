@@ -0,0 +1,154 @@
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+
+
+class KLLSketch:
+    """
+    KLL quantile sketch: approximate quantiles of a stream in O(k) memory.
+    Level h holds items of weight 2**h; a full level is sorted and every other item is promoted to the next one.
+    """
+
+    def __init__(self, k=200, seed=None):
+        self.k = k
+        self.levels = [np.empty(0)]
+        self.count = 0
+        self.min = np.inf
+        self.max = -np.inf
+        self._rng = np.random.default_rng(seed)
+
+    def _capacity(self, level):
+        depth = len(self.levels) - 1 - level
+        return max(2, int(np.ceil(self.k * (2 / 3) ** depth)))
+
+    def _compress(self):
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) > self._capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                items = np.sort(items)
+                # An odd item out stays behind so total weight is preserved exactly
+                keep = items[-1:] if len(items) % 2 else items[:0]
+                paired = items[:len(items) - len(keep)]
+                promoted = paired[self._rng.integers(2)::2]
+                self.levels[level] = keep
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+            level += 1
+
+    def update(self, values):
+        """Add a batch of values; NaNs are ignored."""
+        values = np.asarray(values, dtype=float).ravel()
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return self
+        self.count += len(values)
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+        return self
+
+    def merge(self, other):
+        """Fold another sketch (e.g. from another chunk, plot or worker) into this one."""
+        for level, items in enumerate(other.levels):
+            if level == len(self.levels):
+                self.levels.append(np.empty(0))
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+        return self
+
+    def quantile(self, q):
+        """Approximate q-quantile(s) of everything seen so far (NaN while empty)."""
+        q = np.asarray(q, dtype=float)
+        if not self.count:
+            return np.full(q.shape, np.nan)[()]
+        if len(self.levels) == 1:
+            # Nothing compacted yet: exact, with the same linear interpolation as Series.quantile
+            return np.quantile(self.levels[0], q)
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(items_h), 2 ** h, dtype=float) for h, items_h in enumerate(self.levels)])
+        order = np.argsort(items, kind='stable')
+        items, cumulative = items[order], np.cumsum(weights[order])
+        position = np.searchsorted(cumulative, q * cumulative[-1], side='left')
+        result = items[np.minimum(position, len(items) - 1)]
+        # The exact extremes are tracked separately, so q=0 and q=1 are exact
+        result = np.where(q <= 0, self.min, np.where(q >= 1, self.max, result))
+        return result[()]
+
+    def __len__(self):
+        return self.count
+
+
+# ---------------  Partitioned sketches  ------------
+
+def partition_seed(seed, key):
+    """
+    Seed of the sketch of one partition: its own random stream, so compactions of different partitions are
+    independent and their rank errors cancel when merged. Derived from the key string, so it is the same in every run.
+    """
+    digest = int.from_bytes(hashlib.sha1(str(key).encode()).digest()[:8], 'little')
+    return np.random.SeedSequence([seed, digest])
+
+
+def partition_sketches(values, keys, k=200, seed=0):
+    """One sketch per distinct key (plot, measurement day, ...), built with a single groupby."""
+    values = pd.Series(np.asarray(values, dtype=float))
+    groups = values.groupby(np.asarray(keys), sort=False)
+    return {key: KLLSketch(k=k, seed=partition_seed(seed, key)).update(group.to_numpy()) for key, group in groups}
+
+
+def merge_sketches(sketches, k=200, seed=0):
+    merged = KLLSketch(k=k, seed=seed)
+    for sketch in sketches:
+        merged.merge(sketch)
+    return merged
+
+
+# ---------------  Persistence  ------------
+# All partitions of a variable live in one .npz file next to the data. Keys are stored as strings.
+
+def save_sketches(sketches, path):
+    arrays = {'keys': np.array([str(key) for key in sketches], dtype=str),
+              'k': np.array([sketch.k for sketch in sketches.values()], dtype='int64'),
+              'stats': np.array([[sketch.count, sketch.min, sketch.max] for sketch in sketches.values()],
+                                dtype=float).reshape(-1, 3)}
+    for i, sketch in enumerate(sketches.values()):
+        arrays[f'items_{i}'] = np.concatenate(sketch.levels)
+        arrays[f'sizes_{i}'] = np.array([len(items) for items in sketch.levels], dtype='int64')
+    tmp = path + '.tmp.npz'
+    np.savez(tmp, **arrays)
+    os.replace(tmp, path)
+
+
+def load_sketches(path, seed=0):
+    sketches = {}
+    if not os.path.exists(path):
+        return sketches
+    with np.load(path) as data:
+        for i, key in enumerate(data['keys']):
+            sketch = KLLSketch(k=int(data['k'][i]), seed=partition_seed(seed, key))
+            sizes = data[f'sizes_{i}']
+            sketch.levels = np.split(data[f'items_{i}'], np.cumsum(sizes)[:-1])
+            count, sketch.min, sketch.max = data['stats'][i]
+            sketch.count = int(count)
+            sketches[str(key)] = sketch
+    return sketches
+
+
+def update_sketch_store(path, values, keys, k=200, seed=0):
+    """
+    Sketch the given rows per key and write them into the store at `path`.
+    Partitions present in the new rows replace the stored ones, so re-running a day is idempotent and
+    old days are never rescanned. Returns all stored partitions.
+    """
+    sketches = load_sketches(path, seed=seed)
+    sketches.update({str(key): sketch for key, sketch in partition_sketches(values, keys, k, seed).items()})
+    save_sketches(sketches, path)
+    return sketches
@@ -0,0 +1,133 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple
+
+import matplotlib
+import numpy as np
+
+from profiling import stage
+
+# Headless runs must never open a window, so switch backends before any figure is made
+if os.environ.get('SENTHYMED_FIGURE_DIR'):
+    matplotlib.use('Agg')
+
+import matplotlib.pyplot as plt
+
+
+# ---------------  Settings (read from the environment at call time)  ------------
+# SENTHYMED_FIGURE_DIR      output directory; when set, figures are saved instead of shown
+# SENTHYMED_FIGURE_FORMATS  comma separated file formats, default 'png'
+# SENTHYMED_RENDER_WORKERS  size of the render process pool, default: one per core
+# SENTHYMED_MAX_POINTS      LTTB downsampling target for time-series plots, default: no downsampling
+
+def figure_dir():
+    return os.environ.get('SENTHYMED_FIGURE_DIR')
+
+
+def headless():
+    return figure_dir() is not None
+
+
+def figure_formats():
+    return tuple(fmt.strip() for fmt in os.environ.get('SENTHYMED_FIGURE_FORMATS', 'png').split(',') if fmt.strip())
+
+
+def render_workers():
+    workers = os.environ.get('SENTHYMED_RENDER_WORKERS')
+    return int(workers) if workers else None
+
+
+def max_points():
+    points = os.environ.get('SENTHYMED_MAX_POINTS')
+    return int(points) if points else None
+
+
+# ---------------  Figure jobs  ------------
+
+class FigureJob(NamedTuple):
+    """A named figure: plot_function(**data) draws it and returns the Figure."""
+    name: str
+    plot_function: object
+    data: dict
+
+
+_pending = []
+
+
+def figure(name, plot_function, **data):
+    """Show the figure now, or in headless mode queue it as a job to be rendered by render_pending()."""
+    if not headless():
+        plot_function(**data)
+        plt.show()
+        return
+    _pending.append(FigureJob(name, plot_function, data))
+
+
+def _use_agg():
+    matplotlib.use('Agg')
+
+
+def render_job(job, out_dir, formats=('png',)):
+    _use_agg()
+    fig = job.plot_function(**job.data)
+    paths = []
+    for fmt in formats:
+        path = os.path.join(out_dir, f'{job.name}.{fmt}')
+        fig.savefig(path, format=fmt, bbox_inches='tight')
+        paths.append(path)
+    plt.close(fig)
+    return paths
+
+
+def render_jobs(jobs, out_dir, formats=('png',), workers=None):
+    """Render figure jobs to out_dir in a process pool (serially for workers=1). Returns the written paths."""
+    os.makedirs(out_dir, exist_ok=True)
+    if workers == 1 or len(jobs) <= 1:
+        results = [render_job(job, out_dir, formats) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_use_agg) as pool:
+            futures = [pool.submit(render_job, job, out_dir, formats) for job in jobs]
+            results = [future.result() for future in futures]
+    return [path for paths in results for path in paths]
+
+
+def render_pending():
+    """Render every queued figure (headless mode only) and clear the queue."""
+    if not headless():
+        return []
+    jobs = list(_pending)
+    _pending.clear()
+    with stage('render_figures', rows_in=len(jobs)) as measured:
+        return measured.output(render_jobs(jobs, figure_dir(), figure_formats(), render_workers()))
+
+
+# ---------------  Downsampling  ------------
+
+def lttb_indices(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets: indices of at most n_out points that keep the visual shape of y(x).
+    Points are taken in x order; the first and last points are always kept.
+    """
+    x, y = np.asarray(x), np.asarray(y, dtype=float)
+    n = len(x)
+    if n_out is None or n <= n_out or n_out < 3:
+        return np.arange(n)
+    if np.issubdtype(x.dtype, np.datetime64):
+        x = x.astype('datetime64[ns]').astype('int64')
+    order = np.argsort(x, kind='stable')
+    xs, ys = x[order].astype(float), y[order]
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    selected = np.empty(n_out, dtype='int64')
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            next_x, next_y = xs[end:edges[i + 2]].mean(), np.nanmean(ys[end:edges[i + 2]])
+        else:
+            next_x, next_y = xs[-1], ys[-1]
+        area = np.abs((xs[a] - next_x) * (ys[start:end] - ys[a]) - (xs[a] - xs[start:end]) * (next_y - ys[a]))
+        a = start + int(np.argmax(np.nan_to_num(area, nan=-1.0)))
+        selected[i + 1] = a
+    return order[selected]
@@ -0,0 +1,67 @@
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from profiling import profiled
+
+
+# ---------------  Rule definitions  ------------
+
+class RiskRule(NamedTuple):
+    """One risk level: PAI in [pai_min, pai_max) and soil moisture in (moisture_min, moisture_max]; infinite bounds are open."""
+    label: str
+    pai_min: float = -np.inf
+    pai_max: float = np.inf
+    moisture_min: float = -np.inf
+    moisture_max: float = np.inf
+
+
+DEFAULT_LABEL = 'Moderate Risk'
+
+
+def default_rules(pai_threshold, moisture_threshold):
+    """The three-level scheme of fire_risk.py: dense canopy on dry soil is high risk, the opposite is low risk."""
+    return [
+        RiskRule('High Risk', pai_min=pai_threshold, moisture_max=moisture_threshold),
+        RiskRule('Low Risk', pai_max=pai_threshold, moisture_min=moisture_threshold),
+    ]
+
+
+# ---------------  Batch scoring  ------------
+
+def _rule_condition(rule, pai, soil_moisture):
+    # Only finite bounds are compared, so an infinite reading still matches a rule that doesn't bound that side
+    # A NaN reading never matches, even a rule that leaves its side unbounded, so it falls to the default label
+    condition = ~np.isnan(pai) & ~np.isnan(soil_moisture)
+    if rule.pai_min > -np.inf:
+        condition &= pai >= rule.pai_min
+    if rule.pai_max < np.inf:
+        condition &= pai < rule.pai_max
+    if rule.moisture_min > -np.inf:
+        condition &= soil_moisture > rule.moisture_min
+    if rule.moisture_max < np.inf:
+        condition &= soil_moisture <= rule.moisture_max
+    return condition
+
+
+def score_risk(pai, soil_moisture, rules, default_label=DEFAULT_LABEL):
+    """
+    Risk code per observation; the first matching rule wins and unmatched rows (including NaN) get the default.
+    Returns (codes, labels) where labels[codes[i]] is the risk label of row i.
+    """
+    pai, soil_moisture = np.broadcast_arrays(np.asarray(pai, dtype=float), np.asarray(soil_moisture, dtype=float))
+    conditions = [_rule_condition(rule, pai, soil_moisture) for rule in rules]
+    # Several rules may share a label, so codes index the unique labels in first-seen order
+    labels = list(dict.fromkeys([rule.label for rule in rules] + [default_label]))
+    dtype = np.int8 if len(labels) < 128 else np.int16
+    rule_codes = [dtype(labels.index(rule.label)) for rule in rules]
+    codes = np.select(conditions, rule_codes, default=labels.index(default_label)).astype(dtype, copy=False)
+    return codes, labels
+
+
+@profiled('classify_risk', rows_in_arg=0)
+def classify_risk(pai, soil_moisture, rules, default_label=DEFAULT_LABEL, index=None):
+    """Categorical risk labels for aligned PAI and soil moisture arrays (a scalar moisture is broadcast)."""
+    codes, labels = score_risk(pai, soil_moisture, rules, default_label)
+    return pd.Series(pd.Categorical.from_codes(codes, categories=labels), index=index)
@@ -0,0 +1,220 @@
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from data_loader import load_pai, load_soil_moisture
+from plot_join import plot_day_index
+from risk_engine import DEFAULT_LABEL
+
+
+MOISTURE = 'Volumetric soil moisture'
+LEVELS = ['High Risk', DEFAULT_LABEL, 'Low Risk']
+DEFAULT_PAI_QUANTILES = [0.5, 0.6, 0.7, 0.75, 0.8, 0.9]
+DEFAULT_MOISTURE_THRESHOLDS = [2.5, 5.0, 7.5, 10.0, 12.5, 15.0]
+DEFAULT_RESAMPLES = 2000
+DEFAULT_BATCH_SIZE = 250
+
+# The sweep reproduces the rules of fire_risk.py: with PAI threshold t (a quantile of the resampled PAI) and moisture
+# threshold m, PAI >= t on soil at or below m is High Risk, PAI < t above m is Low Risk, the rest Moderate Risk.
+# mode='campaign' compares every PAI reading with the campaign mean moisture, as risk_distribution does;
+# mode='plot_day' uses the nearest moisture reading of the same plot, as the per-plot table does.
+# A bootstrap replicate draws plots with replacement and keeps all readings of each drawn plot, so it is fully
+# described by its plot multiplicities counts[b, plot]. Every count below is counts[b] @ (a per-plot count) found by
+# binary search in each plot's sorted readings, so a replicate costs O(plots * log readings) steps, not O(readings).
+
+
+# ---------------  Plot-level inputs  ------------
+
+def risk_inputs(pai_df, soil_moisture_df, mode='campaign', tolerance='3D'):
+    """
+    Arrays shared by every replicate: the distinct PAI values, readings sorted by (plot, PAI) as integer keys
+    plot * len(values) + rank of the value, the start of each plot's readings, the count of NaN-PAI readings per plot,
+    and per-plot moisture sums/counts (campaign) or per-reading moisture in key order (plot_day).
+    """
+    if mode == 'plot_day':
+        rows = plot_day_index(pai_df, soil_moisture_df, tolerance=tolerance).dropna(subset=[MOISTURE]).reset_index()
+    elif mode == 'campaign':
+        rows = pai_df
+    else:
+        raise ValueError(f"Unknown mode {mode!r}, expected 'campaign' or 'plot_day'")
+    plots = pd.Index(sorted(set(rows['PLOT'].astype(str)) | set(soil_moisture_df['PLOT'].astype(str))))
+    row_plot = plots.get_indexer(rows['PLOT'].astype(str))
+    pai = rows['PAI'].to_numpy(dtype='float64')
+
+    valid = ~np.isnan(pai)
+    values, ranks = np.unique(pai[valid], return_inverse=True)
+    order = np.lexsort((ranks, row_plot[valid]))
+    keys = row_plot[valid][order].astype('int64') * len(values) + ranks[order]
+    inputs = {'mode': mode, 'plots': np.asarray(plots), 'values': values, 'keys': keys,
+              'starts': np.searchsorted(keys, np.arange(len(plots) + 1) * len(values)),
+              'nan_counts': np.bincount(row_plot[~valid], minlength=len(plots)).astype('float64')}
+    if mode == 'plot_day':
+        inputs['moisture'] = rows[MOISTURE].to_numpy(dtype='float64')[valid][order]
+    else:
+        moisture = soil_moisture_df[MOISTURE].to_numpy(dtype='float64')
+        moisture_plot = plots.get_indexer(soil_moisture_df['PLOT'].astype(str))
+        known = ~np.isnan(moisture)
+        inputs['moisture_sum'] = np.bincount(moisture_plot[known], weights=moisture[known], minlength=len(plots))
+        inputs['moisture_count'] = np.bincount(moisture_plot[known], minlength=len(plots)).astype('float64')
+    return inputs
+
+
+# ---------------  Vectorized replicate scoring  ------------
+
+def _plot_ranks(inputs, ranks):
+    """[replicate, plot] number of each plot's readings whose value rank is below ranks[b]."""
+    n_plots = len(inputs['plots'])
+    queries = np.arange(n_plots) * len(inputs['values']) + np.asarray(ranks)[:, None]
+    return np.searchsorted(inputs['keys'], queries) - inputs['starts'][:-1]
+
+
+def _order_statistic(inputs, counts, k):
+    """Value rank of the k[b]-th smallest PAI reading (0-based) of each replicate, by bisection over the distinct values."""
+    lo = np.zeros(len(counts), dtype='int64')
+    hi = np.full(len(counts), len(inputs['values']) - 1, dtype='int64')
+    while (lo < hi).any():
+        mid = (lo + hi) // 2
+        at_most = (counts * _plot_ranks(inputs, mid + 1)).sum(axis=1)  # Readings with PAI <= values[mid]
+        above = at_most > k
+        lo, hi = np.where(above, lo, mid + 1), np.where(above, mid, hi)
+    return lo
+
+
+def _weighted_quantile(inputs, counts, total, q):
+    """pandas' linear-interpolated quantile of each replicate's PAI readings."""
+    position = q * (total - 1)
+    lower = np.floor(position)
+    fraction = position - lower
+    values = inputs['values']
+    v0 = values[_order_statistic(inputs, counts, lower)]
+    v1 = values[_order_statistic(inputs, counts, np.minimum(lower + 1, total - 1))]
+    return v0 + fraction * (v1 - v0)
+
+
+def moisture_prefix(inputs, moisture_thresholds):
+    """plot_day mode: [threshold, reading + 1] running count of readings (in key order) with moisture <= threshold."""
+    dry = inputs['moisture'][None, :] <= np.asarray(moisture_thresholds, dtype='float64')[:, None]
+    return np.concatenate([np.zeros((len(dry), 1), dtype='int64'), np.cumsum(dry, axis=1)], axis=1)
+
+
+def risk_shares(inputs, counts, pai_quantiles, moisture_thresholds, prefix=None):
+    """
+    Risk level percentages for replicates given as plot multiplicities counts[b, plot].
+    Returns an array [replicate, pai_quantile, moisture_threshold, level] with levels ordered as LEVELS.
+    In plot_day mode, pass moisture_prefix(inputs, moisture_thresholds) to reuse it across calls.
+    """
+    counts = np.asarray(counts, dtype='float64')
+    starts, ends = inputs['starts'][:-1], inputs['starts'][1:]
+    total = counts @ (ends - starts)
+    readings = total + counts @ inputs['nan_counts']
+
+    shares = np.full((len(counts), len(pai_quantiles), len(moisture_thresholds), len(LEVELS)), np.nan)
+    if not len(inputs['values']):
+        return shares
+    if inputs['mode'] == 'plot_day':
+        prefix = moisture_prefix(inputs, moisture_thresholds) if prefix is None else prefix
+    else:
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean_moisture = (counts @ inputs['moisture_sum']) / (counts @ inputs['moisture_count'])
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        for i, q in enumerate(pai_quantiles):
+            threshold = _weighted_quantile(inputs, counts, total, q)
+            below_plot = _plot_ranks(inputs, np.searchsorted(inputs['values'], threshold, side='left'))
+            below = (counts * below_plot).sum(axis=1)  # Readings with PAI < threshold
+            for k, m in enumerate(moisture_thresholds):
+                if inputs['mode'] == 'plot_day':
+                    dry = prefix[k]
+                    dry_below = (counts * (dry[starts + below_plot] - dry[starts])).sum(axis=1)
+                    high = counts @ (dry[ends] - dry[starts]) - dry_below
+                    low = below - dry_below
+                else:
+                    high = (total - below) * (mean_moisture <= m)
+                    low = below * (mean_moisture > m)
+                shares[:, i, k] = 100 * np.column_stack([high, readings - high - low, low]) / readings[:, None]
+    shares[total == 0] = np.nan  # A replicate that drew no PAI readings has no distribution
+    return shares
+
+
+# ---------------  Parallel bootstrap  ------------
+
+_worker = {}
+
+
+def _init_worker(inputs, pai_quantiles, moisture_thresholds):
+    prefix = moisture_prefix(inputs, moisture_thresholds) if inputs['mode'] == 'plot_day' else None
+    _worker.update(inputs=inputs, pai_quantiles=pai_quantiles, moisture_thresholds=moisture_thresholds, prefix=prefix)
+
+
+def _run_batch(seed, size):
+    """One batch of replicates from its own seed, so results don't depend on the number of workers."""
+    rng = np.random.default_rng(seed)
+    n_plots = len(_worker['inputs']['plots'])
+    draws = rng.integers(0, n_plots, size=(size, n_plots))
+    counts = np.bincount((draws + n_plots * np.arange(size)[:, None]).ravel(),
+                         minlength=size * n_plots).reshape(size, n_plots)
+    return risk_shares(_worker['inputs'], counts, _worker['pai_quantiles'], _worker['moisture_thresholds'],
+                       _worker['prefix'])
+
+
+def bootstrap_shares(inputs, pai_quantiles, moisture_thresholds, resamples=DEFAULT_RESAMPLES, seed=0,
+                     batch_size=DEFAULT_BATCH_SIZE, workers=None):
+    """Risk shares of `resamples` plot bootstrap replicates, in batches spread over a process pool (serial for workers=1)."""
+    sizes = [min(batch_size, resamples - start) for start in range(0, resamples, batch_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    args = (inputs, list(pai_quantiles), list(moisture_thresholds))
+    if workers == 1 or len(sizes) <= 1:
+        _init_worker(*args)
+        batches = [_run_batch(s, size) for s, size in zip(seeds, sizes)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=args) as pool:
+            batches = list(pool.map(_run_batch, seeds, sizes))
+    return np.concatenate(batches)
+
+
+def sensitivity_table(pai_df, soil_moisture_df, pai_quantiles=DEFAULT_PAI_QUANTILES,
+                      moisture_thresholds=DEFAULT_MOISTURE_THRESHOLDS, resamples=DEFAULT_RESAMPLES, seed=0,
+                      mode='campaign', confidence=0.95, batch_size=DEFAULT_BATCH_SIZE, workers=None):
+    """
+    Risk distribution (%) for every (PAI quantile, moisture threshold) pair: the estimate on the full data,
+    and the bootstrap mean, standard deviation and percentile confidence interval.
+    """
+    inputs = risk_inputs(pai_df, soil_moisture_df, mode)
+    estimate = risk_shares(inputs, np.ones((1, len(inputs['plots']))), pai_quantiles, moisture_thresholds)[0]
+    replicates = bootstrap_shares(inputs, pai_quantiles, moisture_thresholds, resamples, seed, batch_size, workers)
+    tail = 100 * (1 - confidence) / 2
+    with np.errstate(invalid='ignore'):
+        summary = {'estimate': estimate, 'mean': np.nanmean(replicates, axis=0), 'std': np.nanstd(replicates, axis=0),
+                   'ci_low': np.nanpercentile(replicates, tail, axis=0),
+                   'ci_high': np.nanpercentile(replicates, 100 - tail, axis=0)}
+    index = pd.MultiIndex.from_product([pai_quantiles, moisture_thresholds, LEVELS],
+                                       names=['pai_quantile', 'moisture_threshold', 'Risk_Level'])
+    return pd.DataFrame({name: values.ravel() for name, values in summary.items()}, index=index)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Bootstrap sensitivity of the fire risk distribution to its thresholds.')
+    parser.add_argument('--pai-quantiles', type=float, nargs='+', default=DEFAULT_PAI_QUANTILES)
+    parser.add_argument('--moisture-thresholds', type=float, nargs='+', default=DEFAULT_MOISTURE_THRESHOLDS)
+    parser.add_argument('--resamples', type=int, default=DEFAULT_RESAMPLES)
+    parser.add_argument('--mode', choices=['campaign', 'plot_day'], default='campaign')
+    parser.add_argument('--confidence', type=float, default=0.95)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--out', help='Write the full table to this CSV file')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    table = sensitivity_table(load_pai(), load_soil_moisture(), args.pai_quantiles, args.moisture_thresholds,
+                              args.resamples, args.seed, args.mode, args.confidence, args.batch_size, args.workers)
+    elapsed = time.perf_counter() - start
+    if args.out:
+        table.to_csv(args.out)
+        print(f"Wrote {args.out}")
+    print(f"Risk distribution (%) with {args.confidence:.0%} bootstrap intervals over {args.resamples} plot resamples "
+          f"({args.mode} mode, {elapsed:.1f} s):\n")
+    print(table.round(2).to_string())
@@ -0,0 +1,396 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+from collections import OrderedDict
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+import pandas as pd
+import shapely
+
+from data_loader import (LEAF_TRAITS_DATA_PATH, PAI_DATA_PATH, SOIL_MOISTURE_DATA_PATH, load_leaf_traits, load_pai,
+                         load_soil_moisture, source_fingerprint)
+from leaf_traits import join_leaf_features, leaf_fuel_features
+from plot_join import plot_day_index
+from plot_registry import SOIL_MOISTURE_SHAPEFILE, PlotRegistry
+from risk_engine import classify_risk, default_rules
+
+
+HOST = '127.0.0.1'  # Local only: the service never listens on external interfaces by default
+PORT = 8765
+PAI_QUANTILE = 0.75
+MOISTURE_THRESHOLD = 5.0  # As in fire_risk.py
+TOLERANCE = '3D'  # Nearest soil moisture reading of the same plot
+RELOAD_INTERVAL = 5.0  # Seconds between checks of the source files
+CACHE_SIZE = 1024
+MAX_BATCH = 10000
+MAX_BODY = 16 * 1024 ** 2
+
+
+class QueryError(ValueError):
+    """A bad request; the message is returned to the client with the given HTTP status."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class LRUCache:
+    """Least-recently-used cache of computed aggregates, keyed by query; cleared when the data is reloaded."""
+
+    def __init__(self, maxsize=CACHE_SIZE):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = self.misses = 0
+
+    def get_or_compute(self, key, compute):
+        if key in self.entries:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return self.entries[key]
+        self.misses += 1
+        value = self.entries[key] = compute()
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        self.entries.clear()
+
+    def stats(self):
+        return {'size': len(self.entries), 'maxsize': self.maxsize, 'hits': self.hits, 'misses': self.misses}
+
+
+def _json_value(value):
+    if pd.api.types.is_scalar(value) and pd.isna(value):  # NaN, NaT, None and pd.NA
+        return None
+    if isinstance(value, (float, np.floating)):
+        return float(value)
+    if isinstance(value, np.integer):
+        return int(value)
+    if isinstance(value, pd.Timestamp):
+        return value.strftime('%Y-%m-%d')
+    return value
+
+
+def _parse_tolerance(value):
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise QueryError(f"Invalid tolerance_days {value!r}, expected a whole number of days")
+
+
+def _fingerprints(paths):
+    """Fingerprint of each source file, None for an optional file that doesn't exist."""
+    return {name: source_fingerprint(path) if os.path.exists(path) else None for name, path in paths.items()}
+
+
+def _content_length(headers):
+    text = headers.get('content-length', '0')
+    try:
+        length = int(text)
+    except ValueError:
+        length = -1
+    if length < 0:
+        raise QueryError(f"Invalid Content-Length {text!r}")
+    if length > MAX_BODY:
+        raise QueryError('Request body too large', status=413)
+    return length
+
+
+def _parse_date(text):
+    try:
+        date = pd.Timestamp(text)
+    except (TypeError, ValueError):
+        date = pd.NaT
+    if pd.isna(date):  # Unparseable, or a missing-date spelling such as 'NaT'
+        raise QueryError(f"Invalid date {text!r}, expected YYYY-MM-DD")
+    return date.normalize()
+
+
+# ---------------  In-memory state (rebuilt when the source files change)  ------------
+
+class RiskState:
+    """
+    The plot-day risk table of fire_risk.py, with a sorted date index per plot for nearest-date lookups
+    and plot centroids for bounding-box queries. Immutable once built; a reload builds a new one.
+    """
+
+    def __init__(self, paths, shapefile=SOIL_MOISTURE_SHAPEFILE, tolerance=TOLERANCE):
+        self.fingerprints = _fingerprints(paths)
+        self.loaded_at = time.time()
+        pai_df = load_pai(paths['pai'])
+        soil_moisture_df = load_soil_moisture(paths['soil_moisture'])
+
+        self.pai_threshold = float(pai_df['PAI'].quantile(PAI_QUANTILE))
+        self.rules = default_rules(self.pai_threshold, MOISTURE_THRESHOLD)
+        table = plot_day_index(pai_df, soil_moisture_df, tolerance=tolerance)
+        table['Risk_Level'] = classify_risk(table['PAI'], table['Volumetric soil moisture'], self.rules,
+                                            index=table.index).astype(object)
+        table.loc[table['Volumetric soil moisture'].isna(), 'Risk_Level'] = None  # No moisture reading close enough
+        if os.path.exists(paths['leaf_traits']):
+            table = join_leaf_features(table, leaf_fuel_features(load_leaf_traits(paths['leaf_traits'])))
+        table = table.reset_index()
+        table['PLOT'] = table['PLOT'].astype(str)
+        self.table = table.sort_values(['PLOT', 'Date'], ignore_index=True)
+
+        # Rows of each plot are contiguous and sorted by date
+        self.records = [{column: _json_value(value) for column, value in zip(self.table.columns, row)}
+                        for row in self.table.itertuples(index=False)]
+        self.plots = {}
+        for plot, rows in self.table.groupby('PLOT', sort=True).indices.items():
+            self.plots[plot] = (rows[0], self.table['Date'].to_numpy()[rows])
+        self.locations = self._plot_locations(soil_moisture_df, shapefile)
+
+    @staticmethod
+    def _plot_locations(soil_moisture_df, shapefile):
+        """Centroid (registry CRS) of each plot's moisture locations; None when the shapefile can't be read."""
+        try:
+            registry = PlotRegistry.from_shapefile(shapefile)
+        except Exception:
+            return None
+        located = registry.attach(soil_moisture_df)
+        xy = shapely.get_coordinates(registry.geometry.values)
+        located = located.assign(x=xy[located['LOC_KEY'], 0], y=xy[located['LOC_KEY'], 1])
+        centroids = located.groupby('PLOT', observed=True)[['x', 'y']].mean()
+        return {'plots': centroids.index.astype(str).to_numpy(), 'x': centroids['x'].to_numpy(),
+                'y': centroids['y'].to_numpy(), 'crs': registry.crs}
+
+    def _plot(self, plot):
+        if plot not in self.plots:
+            raise QueryError(f"Unknown plot {plot!r}", status=404)
+        return self.plots[plot]
+
+    def lookup(self, plot, date, tolerance=None):
+        """The plot-day nearest to `date` (within `tolerance` days when given), or None."""
+        start, dates = self._plot(plot)
+        target = np.datetime64(date, 'ns')
+        position = int(np.searchsorted(dates, target))
+        candidates = [i for i in (position - 1, position) if 0 <= i < len(dates)]
+        best = min(candidates, key=lambda i: abs(dates[i] - target))
+        if tolerance is not None and abs(dates[best] - target) > np.timedelta64(tolerance, 'D'):
+            return None
+        return self.records[start + best]
+
+    def summary(self, plot, start=None, end=None):
+        """Risk level counts and mean PAI, moisture and LFMC over a plot's days in [start, end]."""
+        first, dates = self._plot(plot)
+        lo = np.searchsorted(dates, np.datetime64(start, 'ns')) if start is not None else 0
+        hi = np.searchsorted(dates, np.datetime64(end, 'ns'), side='right') if end is not None else len(dates)
+        days = self.table.iloc[first + lo:first + hi]
+        means = days.select_dtypes('number').drop(columns=['Moisture_Lag_Days'], errors='ignore').mean()
+        return {'plot': plot, 'days': len(days),
+                'first_date': _json_value(days['Date'].min()) if len(days) else None,
+                'last_date': _json_value(days['Date'].max()) if len(days) else None,
+                'risk_levels': {str(level): int(count) for level, count in days['Risk_Level'].value_counts().items()},
+                'means': {column: _json_value(value) for column, value in means.items()}}
+
+    def plots_in_bbox(self, minx, miny, maxx, maxy):
+        if self.locations is None:
+            raise QueryError("Plot locations are unavailable (the shapefile could not be read)", status=503)
+        inside = ((self.locations['x'] >= minx) & (self.locations['x'] <= maxx)
+                  & (self.locations['y'] >= miny) & (self.locations['y'] <= maxy))
+        return [plot for plot in self.locations['plots'][inside] if plot in self.plots]
+
+
+# ---------------  Service  ------------
+
+class RiskService:
+    """Serves queries from the current RiskState; a background task swaps in a new state when the files change."""
+
+    def __init__(self, paths, shapefile=SOIL_MOISTURE_SHAPEFILE, tolerance=TOLERANCE, cache_size=CACHE_SIZE,
+                 reload_interval=RELOAD_INTERVAL):
+        self.paths = paths
+        self.shapefile = shapefile
+        self.tolerance = tolerance
+        self.reload_interval = reload_interval
+        self.cache = LRUCache(cache_size)
+        self.state = RiskState(paths, shapefile, tolerance)
+        self.version = 1
+        self.reload_error = None
+
+    def _changed(self):
+        try:
+            return _fingerprints(self.paths) != self.state.fingerprints
+        except OSError:  # A file is being replaced; check again on the next tick
+            return False
+
+    async def watch(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            if not self._changed():
+                continue
+            try:
+                # Built off the event loop, so queries keep being answered from the old state meanwhile
+                state = await loop.run_in_executor(None, RiskState, self.paths, self.shapefile, self.tolerance)
+            except Exception as error:
+                self.reload_error = f'{type(error).__name__}: {error}'
+                continue
+            self.state, self.version, self.reload_error = state, self.version + 1, None
+            self.cache.clear()
+
+    # ---------------  Endpoints  ------------
+
+    def health(self, query):
+        state = self.state
+        return {'status': 'ok', 'version': self.version, 'loaded_at': state.loaded_at, 'plots': len(state.plots),
+                'plot_days': len(state.records), 'pai_threshold': state.pai_threshold,
+                'moisture_threshold': MOISTURE_THRESHOLD, 'cache': self.cache.stats(), 'reload_error': self.reload_error}
+
+    def plots(self, query):
+        state = self.state
+        return {'plots': [{'plot': plot, 'days': len(dates), 'first_date': _json_value(pd.Timestamp(dates[0])),
+                           'last_date': _json_value(pd.Timestamp(dates[-1]))}
+                          for plot, (_, dates) in state.plots.items()]}
+
+    def _risk(self, state, plot, date, tolerance):
+        if not plot or not date:
+            raise QueryError("plot and date are required")
+        record = state.lookup(plot, _parse_date(date), tolerance)
+        return {'plot': plot, 'date': date, 'match': record}
+
+    def risk(self, query):
+        return self._risk(self.state, query.get('plot'), query.get('date'), _parse_tolerance(query.get('tolerance_days')))
+
+    def risk_batch(self, query, body):
+        queries = body.get('queries') if isinstance(body, dict) else None
+        if not isinstance(queries, list):
+            raise QueryError('Expected a JSON body {"queries": [{"plot": ..., "date": ...}, ...]}')
+        if len(queries) > MAX_BATCH:
+            raise QueryError(f"At most {MAX_BATCH} queries per batch", status=413)
+        state = self.state  # One consistent state for the whole batch, even if a reload lands meanwhile
+        results = []
+        for item in queries:
+            try:
+                if not isinstance(item, dict):
+                    raise QueryError("Each query must be an object")
+                results.append(self._risk(state, item.get('plot'), item.get('date'),
+                                          _parse_tolerance(item.get('tolerance_days'))))
+            except QueryError as error:
+                results.append({'error': str(error), 'query': item})
+        return {'results': results}
+
+    def risk_bbox(self, query):
+        try:
+            bbox = tuple(float(query[key]) for key in ('minx', 'miny', 'maxx', 'maxy'))
+        except (KeyError, ValueError):
+            raise QueryError("minx, miny, maxx and maxy are required (registry CRS)")
+        state = self.state
+        plots = self.cache.get_or_compute((self.version, 'bbox', bbox), lambda: state.plots_in_bbox(*bbox))
+        date = query.get('date')
+        if date is None:
+            return {'plots': plots}
+        tolerance = _parse_tolerance(query.get('tolerance_days'))
+        return {'plots': plots, 'results': [self._risk(state, plot, date, tolerance) for plot in plots]}
+
+    def summary(self, query):
+        plot = query.get('plot')
+        if not plot:
+            raise QueryError("plot is required")
+        start = _parse_date(query['start']) if 'start' in query else None
+        end = _parse_date(query['end']) if 'end' in query else None
+        state = self.state
+        return self.cache.get_or_compute((self.version, 'summary', plot, start, end),
+                                         lambda: state.summary(plot, start, end))
+
+    # ---------------  HTTP  ------------
+
+    def dispatch(self, method, target, body):
+        url = urlsplit(target)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        routes = {('GET', '/health'): self.health, ('GET', '/plots'): self.plots, ('GET', '/risk'): self.risk,
+                  ('GET', '/risk/bbox'): self.risk_bbox, ('GET', '/summary'): self.summary}
+        if (method, url.path) == ('POST', '/risk/batch'):
+            try:
+                return 200, self.risk_batch(query, json.loads(body or b'{}'))
+            except json.JSONDecodeError:
+                raise QueryError("Body is not valid JSON")
+        if (method, url.path) not in routes:
+            known = {path for _, path in routes} | {'/risk/batch'}
+            raise QueryError(f"No route {method} {url.path}", status=405 if url.path in known else 404)
+        return 200, routes[method, url.path](query)
+
+    async def handle(self, reader, writer):
+        """One connection; HTTP/1.1 keep-alive, so a client can send many requests over it."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, target, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                try:
+                    length = _content_length(headers)
+                except QueryError as error:  # The body can't be skipped reliably, so the connection is closed
+                    status, data = error.status, json.dumps({'error': str(error)}).encode()
+                    keep_alive = False
+                else:
+                    body = await reader.readexactly(length) if length else b''
+                    try:
+                        status, payload = self.dispatch(method, target, body)
+                        data = json.dumps(payload).encode()  # Inside the try, so a value JSON can't encode is a 500
+                    except QueryError as error:
+                        status, data = error.status, json.dumps({'error': str(error)}).encode()
+                    except Exception as error:
+                        status, data = 500, json.dumps({'error': f'{type(error).__name__}: {error}'}).encode()
+                    keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                writer.write(f"{version} {status} {_REASONS.get(status, '')}\r\n"
+                             f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n"
+                             f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host=HOST, port=PORT):
+        server = await asyncio.start_server(self.handle, host, port, backlog=1024)
+        watcher = asyncio.create_task(self.watch())
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            watcher.cancel()
+
+
+_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 413: 'Payload Too Large',
+            500: 'Internal Server Error', 503: 'Service Unavailable'}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Local fire-risk query service (JSON over HTTP).')
+    parser.add_argument('--host', default=HOST)
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--pai', default=PAI_DATA_PATH)
+    parser.add_argument('--soil-moisture', default=SOIL_MOISTURE_DATA_PATH)
+    parser.add_argument('--leaf-traits', default=LEAF_TRAITS_DATA_PATH)
+    parser.add_argument('--shapefile', default=SOIL_MOISTURE_SHAPEFILE)
+    parser.add_argument('--tolerance', default=TOLERANCE)
+    parser.add_argument('--cache-size', type=int, default=CACHE_SIZE)
+    parser.add_argument('--reload-interval', type=float, default=RELOAD_INTERVAL)
+    args = parser.parse_args()
+
+    paths = {'pai': args.pai, 'soil_moisture': args.soil_moisture, 'leaf_traits': args.leaf_traits}
+    service = RiskService(paths, args.shapefile, args.tolerance, args.cache_size, args.reload_interval)
+    print(f"Serving {len(service.state.plots)} plots on http://{args.host}:{args.port} "
+          f"(GET /health /plots /risk /risk/bbox /summary, POST /risk/batch)")
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,170 @@
+import numpy as np
+import pandas as pd
+
+from profiling import profiled
+
+
+DEFAULT_WINDOWS = ('7D',)
+STATS = ('mean', 'count', 'sum', 'std')
+
+
+def window_column(column, stat, window):
+    return f'{column}_{stat}_{window}'
+
+
+class PlotTimeline:
+    """
+    Measurements sorted once by (PLOT, time), with the row range of each plot.
+    Windows are real time spans within one plot, never row counts, so irregular sampling
+    and rows of other plots can't leak into a window. Rows sharing a timestamp keep their input order.
+    """
+
+    def __init__(self, df, time_column='MEAS_DATETIME', plot_column='PLOT'):
+        plots = df[plot_column].astype('category')
+        times = df[time_column].to_numpy('datetime64[ns]').view('int64')
+        self.index = df.index
+        self.order = np.lexsort((times, plots.cat.codes.to_numpy()))
+        self.times = times[self.order]
+        self.codes = plots.cat.codes.to_numpy().astype('int64')[self.order] + 1  # 0 for a missing PLOT
+        self.bounds = np.flatnonzero(np.diff(self.codes, prepend=-2, append=-2))  # Start of each plot's rows, plus the end
+        self._build_keys()
+
+    def _build_keys(self):
+        """
+        Sorted composite keys code * span + time key, so one searchsorted finds window edges in every plot at once.
+        The time key is the offset from the earliest time when code * span fits in int64, else the rank among
+        the distinct timestamps (slower to look up, but any number of plots and any time range fit).
+        """
+        start = self.times.min() if len(self) else 0
+        extent = int(self.times.max() - start) + 1 if len(self) else 1
+        self.start = start
+        if (int(self.codes.max(initial=0)) + 1) * extent < 2 ** 62:
+            self.unique_times, self.time_order, self.span = None, None, extent
+            self.keys = self.codes * self.span + (self.times - start)
+            return
+        self.time_order = np.argsort(self.times, kind='stable')
+        by_time = self.times[self.time_order]
+        distinct = np.diff(by_time, prepend=by_time[:1] - 1) != 0
+        self.unique_times = by_time[distinct]
+        ranks = np.empty(len(self), dtype='int64')
+        ranks[self.time_order] = np.cumsum(distinct) - 1
+        self.span = len(self.unique_times)
+        self.keys = self.codes * self.span + ranks
+
+    def _first_after(self, limits):
+        """Sorted position of the first row of each row's plot with a time after limits[i], for all plots in one pass."""
+        if self.unique_times is None:
+            # Clipping keeps each query inside its own plot's key range
+            time_keys = np.clip(limits - self.start, -1, self.span - 1)
+        else:
+            # Rank of the latest distinct time <= the limit (-1 if none). Limits are a shift of the times,
+            # so they are searched in time order, which keeps the searches cache-friendly.
+            time_keys = np.empty(len(self), dtype='int64')
+            time_keys[self.time_order] = np.searchsorted(self.unique_times, limits[self.time_order], side='right') - 1
+        return np.searchsorted(self.keys, self.codes * self.span + time_keys, side='right')
+
+    def __len__(self):
+        return len(self.order)
+
+    def _sorted(self, values):
+        return np.asarray(values, dtype='float64')[self.order]
+
+    def _unsort(self, sorted_values):
+        result = np.empty_like(sorted_values)
+        result[self.order] = sorted_values
+        return result
+
+    def window_bounds(self, window, center=True):
+        """
+        [lo, hi) row range of each row's window, in sorted order: (t - w/2, t + w/2] centered,
+        (t - w, t] trailing, the same spans as pandas time-based rolling. As in pandas, a trailing
+        window ends at its own row, so of several rows sharing a timestamp only the earlier ones are included.
+        """
+        width = pd.Timedelta(window).value
+        before, after = (width // 2, width - width // 2) if center else (width, 0)
+        lo = self._first_after(self.times - before)
+        hi = self._first_after(self.times + after) if center else np.arange(1, len(self) + 1)
+        return lo, hi
+
+    @profiled('rolling_windows')
+    def rolling(self, values, windows=DEFAULT_WINDOWS, stats=('mean',), center=True, min_periods=1):
+        """
+        Per-plot time-window statistics for every row, as {(stat, window): array in the input row order}.
+        All windows share one pass of prefix sums over the sorted values; each window is then O(n).
+        """
+        unknown = set(stats) - set(STATS)
+        if unknown:
+            raise ValueError(f"Unknown rolling statistics {sorted(unknown)}, expected some of {STATS}")
+        values = self._sorted(values)
+        valid = ~np.isnan(values)
+        # Prefix sums of values centered on their plot mean, so long series don't lose precision to cancellation
+        plot_sums = np.bincount(self.codes[valid], weights=values[valid], minlength=self.codes.max(initial=0) + 1)
+        plot_counts = np.bincount(self.codes[valid], minlength=len(plot_sums))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            offsets = np.nan_to_num(plot_sums / plot_counts)[self.codes]
+        centered = np.where(valid, values - offsets, 0.0)
+        counts = np.concatenate(([0], np.cumsum(valid)))
+        sums = np.concatenate(([0.0], np.cumsum(centered)))
+        squares = np.concatenate(([0.0], np.cumsum(centered ** 2))) if 'std' in stats else None
+
+        results = {}
+        for window in windows:
+            lo, hi = self.window_bounds(window, center)
+            n = (counts[hi] - counts[lo]).astype('float64')
+            total = sums[hi] - sums[lo]
+            enough = n >= max(min_periods, 1)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                mean = total / n
+                for stat in stats:
+                    if stat == 'mean':
+                        result = mean + offsets
+                    elif stat == 'count':
+                        result = n
+                    elif stat == 'sum':
+                        result = total + n * offsets
+                    else:
+                        variance = (squares[hi] - squares[lo] - n * mean ** 2) / (n - 1)
+                        result = np.sqrt(np.clip(variance, 0, None))
+                        result[n < 2] = np.nan
+                    if stat != 'count':
+                        result = np.where(enough, result, np.nan)
+                    results[stat, window] = self._unsort(result)
+        return results
+
+    @profiled('ewm_means')
+    def ewm(self, values, halflives=DEFAULT_WINDOWS):
+        """Per-plot exponentially weighted mean with a real-time half-life, as {halflife: array in the input row order}."""
+        values = self._sorted(values)
+        times = pd.to_datetime(self.times)
+        results = {}
+        for halflife in halflives:
+            result = np.empty(len(values))
+            for start, end in zip(self.bounds[:-1], self.bounds[1:]):
+                series = pd.Series(values[start:end])
+                result[start:end] = series.ewm(halflife=pd.Timedelta(halflife), times=times[start:end]).mean()
+            results[halflife] = self._unsort(result)
+        return results
+
+
+def rolling_plot_stats(df, value_columns, windows=DEFAULT_WINDOWS, stats=('mean',), time_column='MEAS_DATETIME',
+                       center=True, min_periods=1, timeline=None):
+    """
+    Centered (or trailing) time-window statistics per PLOT, one column per (value, stat, window),
+    named like 'PAI_mean_7D' and aligned with df's index. Pass a PlotTimeline to reuse one sort across calls.
+    """
+    timeline = timeline if timeline is not None else PlotTimeline(df, time_column)
+    columns = {}
+    for column in value_columns:
+        for (stat, window), result in timeline.rolling(df[column], windows, stats, center, min_periods).items():
+            columns[window_column(column, stat, window)] = result
+    return pd.DataFrame(columns, index=df.index)
+
+
+def ewm_plot_means(df, value_columns, halflives=DEFAULT_WINDOWS, time_column='MEAS_DATETIME', timeline=None):
+    """Exponentially weighted means per PLOT with real-time half-lives, columns named like 'PAI_ewm_30D'."""
+    timeline = timeline if timeline is not None else PlotTimeline(df, time_column)
+    columns = {}
+    for column in value_columns:
+        for halflife, result in timeline.ewm(df[column], halflives).items():
+            columns[window_column(column, 'ewm', halflife)] = result
+    return pd.DataFrame(columns, index=df.index)
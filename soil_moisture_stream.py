@@ -0,0 +1,157 @@
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from data_loader import SOIL_MOISTURE_CSV_OPTIONS, SOIL_MOISTURE_DATA_PATH, clean_soil_moisture, plot_key
+from quantile_sketch import KLLSketch, load_sketches, merge_sketches, partition_seed, save_sketches
+
+
+MOISTURE = 'Volumetric soil moisture'
+DEFAULT_CHUNKSIZE = 100_000
+
+
+# ---------------  Chunked reading and cleaning  ------------
+
+def iter_soil_moisture_chunks(path=SOIL_MOISTURE_DATA_PATH, chunksize=DEFAULT_CHUNKSIZE):
+    """Cleaned soil moisture batches of at most `chunksize` rows, read lazily from the text file."""
+    with pd.read_csv(path, chunksize=chunksize, **SOIL_MOISTURE_CSV_OPTIONS) as reader:
+        for chunk in reader:
+            # Handling missing data: drop rows where any of the critical measurements are missing
+            chunk = chunk.dropna(subset=[MOISTURE, 'MEAS_DATE', 'MEAS_TIME'])
+            chunk['MEAS_DATE'] = chunk['MEAS_DATE'].astype('int64')
+            chunk = clean_soil_moisture(chunk)
+            chunk['PLOT'] = plot_key(chunk['SITE'], chunk['SITE_PLOT'])
+            yield chunk.dropna(subset=[MOISTURE])
+
+
+# ---------------  Incremental aggregates  ------------
+
+class RunningStats:
+    """Count, mean, variance (Chan's parallel update), min and max of a stream of batches."""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        n = len(values)
+        if not n:
+            return self
+        batch_mean = values.mean()
+        batch_m2 = ((values - batch_mean) ** 2).sum()
+        total = self.count + n
+        delta = batch_mean - self.mean
+        self.m2 += batch_m2 + delta ** 2 * self.count * n / total
+        self.mean += delta * n / total
+        self.count = total
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
+        return self
+
+    @property
+    def std(self):
+        return np.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else np.nan
+
+
+class SoilMoistureSummary:
+    """Aggregates of a soil moisture log folded in batch by batch; memory depends on days and plots, not rows."""
+
+    def __init__(self, sketch_k=200, seed=0):
+        self.stats = RunningStats()
+        self.sketch_k = sketch_k
+        self.seed = seed
+        self.day_sketches = {}  # One quantile sketch per MEAS_DATE, mergeable across runs
+        self.daily_sum = pd.Series(dtype=float)
+        self.daily_count = pd.Series(dtype='int64')
+        self.plot_min = pd.Series(dtype=float)
+        self.plot_max = pd.Series(dtype=float)
+        self.first_datetime = None
+
+    def update(self, chunk):
+        values = chunk[MOISTURE].to_numpy(dtype=float)
+        self.stats.update(values)
+        for day, day_values in chunk.groupby('MEAS_DATE')[MOISTURE]:
+            if str(day) not in self.day_sketches:
+                self.day_sketches[str(day)] = KLLSketch(k=self.sketch_k, seed=partition_seed(self.seed, day))
+            self.day_sketches[str(day)].update(day_values.to_numpy())
+
+        daily = chunk.groupby('MEAS_DATE')[MOISTURE].agg(['sum', 'count'])
+        self.daily_sum = self.daily_sum.add(daily['sum'], fill_value=0)
+        self.daily_count = self.daily_count.add(daily['count'], fill_value=0).astype('int64')
+
+        # Keyed on PLOT (SITE_SITE_PLOT): plot numbers repeat across sites in multi-site logs
+        extremes = chunk.groupby('PLOT', observed=True)[MOISTURE].agg(['min', 'max'])
+        extremes.index = extremes.index.astype(str)
+        self.plot_min = self.plot_min.combine(extremes['min'], min, fill_value=np.inf)
+        self.plot_max = self.plot_max.combine(extremes['max'], max, fill_value=-np.inf)
+
+        chunk_first = chunk['MEAS_DATETIME'].min()
+        if self.first_datetime is None or chunk_first < self.first_datetime:
+            self.first_datetime = chunk_first
+        return self
+
+    @property
+    def sketch(self):
+        return merge_sketches(self.day_sketches.values(), k=self.sketch_k, seed=self.seed)
+
+    def persist_sketches(self, path):
+        """Write this run's per-day sketches into the store at `path`, replacing days seen again."""
+        stored = load_sketches(path, seed=self.seed)
+        stored.update(self.day_sketches)
+        save_sketches(stored, path)
+        return stored
+
+    def describe(self):
+        """Same index as Series.describe(); the quartiles come from the quantile sketch."""
+        q25, q50, q75 = self.sketch.quantile([0.25, 0.5, 0.75])
+        return pd.Series([self.stats.count, self.stats.mean, self.stats.std, self.stats.min,
+                          q25, q50, q75, self.stats.max],
+                         index=['count', 'mean', 'std', 'min', '25%', '50%', '75%', 'max'], name=MOISTURE)
+
+    def mean_by_day(self):
+        mean = (self.daily_sum / self.daily_count).sort_index()
+        mean.index = pd.to_datetime(mean.index.astype(str), format='%Y%m%d')
+        mean.index.name = 'MEAS_DATE'
+        return mean.rename(MOISTURE)
+
+    def extreme_plots(self, high=0.9, low=0.1):
+        """Plots with at least one reading above the `high` / below the `low` quantile."""
+        high_threshold, low_threshold = self.sketch.quantile([high, low])
+        return (self.plot_max.index[self.plot_max > high_threshold].to_numpy(),
+                self.plot_min.index[self.plot_min < low_threshold].to_numpy())
+
+
+def summarize_soil_moisture(path=SOIL_MOISTURE_DATA_PATH, chunksize=DEFAULT_CHUNKSIZE, **kwargs):
+    summary = SoilMoistureSummary(**kwargs)
+    for chunk in iter_soil_moisture_chunks(path, chunksize):
+        summary.update(chunk)
+    return summary
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Constant-memory summary of a soil moisture log.')
+    parser.add_argument('path', nargs='?', default=SOIL_MOISTURE_DATA_PATH)
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument('--sketch-store', help='.npz file of per-day quantile sketches to update')
+    args = parser.parse_args()
+
+    summary = summarize_soil_moisture(args.path, args.chunksize)
+
+    print("Descriptive Statistics for Soil Moisture:")
+    print(summary.describe())
+    print("\nMean Soil Moisture by Day:")
+    print(summary.mean_by_day())
+    high_plots, low_plots = summary.extreme_plots()
+    print(f"\nAreas with High Moisture (Top 10%): {high_plots}")
+    print(f"Areas with Low Moisture (Bottom 10%): {low_plots}")
+
+    if args.sketch_store:
+        history = merge_sketches(summary.persist_sketches(args.sketch_store).values())
+        low_threshold, high_threshold = history.quantile([0.1, 0.9])
+        print(f"\nMoisture thresholds over all stored days: 10% = {low_threshold:.2f}, 90% = {high_threshold:.2f}")
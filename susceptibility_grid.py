@@ -0,0 +1,129 @@
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import shapely
+from scipy.spatial import cKDTree
+
+from data_loader import load_pai, load_soil_moisture
+from plot_registry import SOIL_MOISTURE_SHAPEFILE, PlotRegistry
+
+
+MOISTURE = 'Volumetric soil moisture'
+DEFAULT_TILE_SIZE = 512
+
+
+# ---------------  Plot-level susceptibility  ------------
+
+def _min_max(values):
+    span = values.max() - values.min()
+    return (values - values.min()) / span if span > 0 else values * 0.0
+
+
+def plot_susceptibility(pai_df, soil_moisture_df, registry):
+    """
+    One point per PLOT (centroid of its moisture locations) with a 0-1 susceptibility score:
+    the mean of min-max scaled PAI (fuel load) and min-max scaled dryness (1 - moisture).
+    """
+    located = registry.attach(soil_moisture_df)
+    xy = shapely.get_coordinates(registry.geometry.values)
+    located = located.assign(x=xy[located['LOC_KEY'], 0], y=xy[located['LOC_KEY'], 1])
+    plots = located.groupby('PLOT', observed=True).agg(x=('x', 'mean'), y=('y', 'mean'), moisture=(MOISTURE, 'mean'))
+    plots['PAI'] = pai_df.groupby('PLOT', observed=True)['PAI'].mean()
+    plots = plots.dropna()
+    plots['SUSCEPTIBILITY'] = 0.5 * _min_max(plots['PAI']) + 0.5 * (1 - _min_max(plots['moisture']))
+    return plots
+
+
+# ---------------  Tiled IDW interpolation  ------------
+
+_worker = {}
+
+
+def _init_worker(points, values, out_path, shape, bounds, resolution, neighbours, power):
+    _worker.update(tree=cKDTree(points), values=values, out_path=out_path, shape=shape,
+                   bounds=bounds, resolution=resolution, neighbours=min(neighbours, len(values)), power=power)
+
+
+def _render_tile(tile):
+    """Interpolate one block of rows/cols and write it straight into the memory-mapped grid."""
+    row0, row1, col0, col1 = tile
+    minx, miny, maxx, maxy = _worker['bounds']
+    res = _worker['resolution']
+    xs = minx + (np.arange(col0, col1) + 0.5) * res
+    ys = maxy - (np.arange(row0, row1) + 0.5) * res  # North-up: row 0 is the top of the grid
+    grid_x, grid_y = np.meshgrid(xs, ys)
+    targets = np.column_stack([grid_x.ravel(), grid_y.ravel()])
+
+    distances, indices = _worker['tree'].query(targets, k=_worker['neighbours'])
+    distances, indices = distances.reshape(len(targets), -1), indices.reshape(len(targets), -1)
+    with np.errstate(divide='ignore'):
+        weights = 1.0 / distances ** _worker['power']
+    exact = distances[:, 0] == 0
+    weights[exact] = 0.0
+    weights[exact, 0] = 1.0  # A cell centre on a plot takes the plot value
+    block = (weights * _worker['values'][indices]).sum(axis=1) / weights.sum(axis=1)
+
+    grid = np.load(_worker['out_path'], mmap_mode='r+')
+    grid[row0:row1, col0:col1] = block.reshape(row1 - row0, col1 - col0).astype(grid.dtype)
+    grid.flush()
+    return tile
+
+
+def grid_tiles(shape, tile_size=DEFAULT_TILE_SIZE):
+    nrows, ncols = shape
+    return [(r, min(r + tile_size, nrows), c, min(c + tile_size, ncols))
+            for r in range(0, nrows, tile_size) for c in range(0, ncols, tile_size)]
+
+
+def interpolate_grid(points, values, bounds, resolution, out_path, crs=None, tile_size=DEFAULT_TILE_SIZE,
+                     neighbours=8, power=2.0, workers=None):
+    """
+    Inverse-distance-weighted surface over `bounds` at `resolution`, built tile by tile in a process pool.
+    The grid is a float32 .npy file opened as a memmap, so it never has to fit in memory; a .json sidecar
+    holds the georeferencing. Returns the grid opened read-only with mmap_mode='r'.
+    """
+    minx, miny, maxx, maxy = bounds
+    shape = (int(np.ceil((maxy - miny) / resolution)), int(np.ceil((maxx - minx) / resolution)))
+    np.lib.format.open_memmap(out_path, mode='w+', dtype=np.float32, shape=shape).flush()
+
+    points, values = np.asarray(points, dtype=float), np.asarray(values, dtype=float)
+    init_args = (points, values, out_path, shape, bounds, resolution, neighbours, power)
+    tiles = grid_tiles(shape, tile_size)
+    if workers == 1:
+        _init_worker(*init_args)
+        for tile in tiles:
+            _render_tile(tile)
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=init_args) as pool:
+            list(pool.map(_render_tile, tiles))
+
+    metadata = {'bounds': list(bounds), 'resolution': resolution, 'shape': list(shape), 'crs': crs,
+                'origin': 'upper-left', 'method': 'idw', 'neighbours': neighbours, 'power': power}
+    with open(os.path.splitext(out_path)[0] + '.json', 'w') as f:
+        json.dump(metadata, f, indent=2)
+    return np.load(out_path, mmap_mode='r')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Fire-susceptibility grid interpolated from plot PAI and soil moisture.')
+    parser.add_argument('--out', default='susceptibility.npy')
+    parser.add_argument('--resolution', type=float, default=10.0, help='Cell size in metres')
+    parser.add_argument('--margin', type=float, default=500.0, help='Padding around the plots in metres')
+    parser.add_argument('--tile-size', type=int, default=DEFAULT_TILE_SIZE)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    registry = PlotRegistry.from_shapefile(SOIL_MOISTURE_SHAPEFILE)
+    plots = plot_susceptibility(load_pai(), load_soil_moisture(), registry)
+    print("Plot Fire Susceptibility:")
+    print(plots)
+
+    bounds = (plots['x'].min() - args.margin, plots['y'].min() - args.margin,
+              plots['x'].max() + args.margin, plots['y'].max() + args.margin)
+    grid = interpolate_grid(plots[['x', 'y']].to_numpy(), plots['SUSCEPTIBILITY'].to_numpy(), bounds,
+                            args.resolution, args.out, crs=registry.crs, tile_size=args.tile_size,
+                            workers=args.workers)
+    print(f"\nWrote {grid.shape[0]} x {grid.shape[1]} grid to {args.out}")
@@ -0,0 +1,95 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from data_loader import LEAF_TRAITS_DATA_PATH, PAI_DATA_PATH, SOIL_MOISTURE_DATA_PATH
+
+
+# Synthetic campaigns are resampled from the real sample files, so they keep the real schemas and quirks:
+# tab delimiters, CRLF line ends, 'NA' strings, decimal commas in the soil moisture values and
+# BAD_READINGS='ERROR' rows. Values get multiplicative noise and dates are shifted by up to MAX_DAY_SHIFT days.
+
+MAX_DAY_SHIFT = 3 * 365
+
+PAI_VALUE_COLUMNS = ['PAI', 'GAP1', 'GAP2', 'GAP3', 'GAP4', 'GAP5']
+SOIL_MOISTURE_VALUE_COLUMNS = ['Volumetric soil moisture', 'Soil temperature', 'EC']
+LEAF_TRAIT_VALUE_COLUMNS = ['CHL_PROSPECT', 'CAR_PROSPECT', 'ANT_PROSPECT', 'EWT_PROSPECT', 'EWT_LAB',
+                            'LMA_PROSPECT', 'LMA_LAB', 'PROT_PROSPECT', 'CBC_PROSPECT']
+
+
+def _read_raw(path):
+    return pd.read_csv(path, delimiter='\t', dtype=str, keep_default_na=False)
+
+
+def _resample(raw, scale, rng):
+    return raw.iloc[rng.integers(0, len(raw), size=len(raw) * scale)].reset_index(drop=True)
+
+
+def _shift_dates(dates, rng):
+    shifted = pd.to_datetime(dates, format='%Y%m%d') + pd.to_timedelta(rng.integers(0, MAX_DAY_SHIFT, len(dates)), unit='D')
+    return shifted.dt.strftime('%Y%m%d')
+
+
+def _jitter(values, rng, decimal_comma=False, noise=0.05, fmt='%.6g'):
+    """Multiply the numeric entries by lognormal noise and write them back in the source format; 'NA' stays 'NA'."""
+    numeric = pd.to_numeric(values.str.replace(',', '.'), errors='coerce')
+    jittered = numeric * rng.lognormal(0.0, noise, len(values))
+    text = pd.Series(np.char.mod(fmt, jittered.fillna(0).to_numpy()), index=values.index)
+    if decimal_comma:
+        text = text.str.replace('.', ',')
+    return text.where(numeric.notna(), values)
+
+
+def _write(df, path):
+    df.to_csv(path, sep='\t', index=False, lineterminator='\r\n')
+    return path
+
+
+def generate_pai(path, scale, rng, error_rate=0.013):
+    df = _resample(_read_raw(PAI_DATA_PATH), scale, rng)
+    df['MEAS_DATE'] = _shift_dates(df['MEAS_DATE'], rng)
+    for column in PAI_VALUE_COLUMNS:
+        df[column] = _jitter(df[column], rng)
+    df['BAD_READINGS'] = np.where(rng.random(len(df)) < error_rate, 'ERROR', 'NA')
+    return _write(df, path)
+
+
+def generate_soil_moisture(path, scale, rng, na_rate=0.01):
+    df = _resample(_read_raw(SOIL_MOISTURE_DATA_PATH), scale, rng)
+    df['MEAS_DATE'] = _shift_dates(df['MEAS_DATE'], rng)
+    for column in SOIL_MOISTURE_VALUE_COLUMNS:
+        df[column] = _jitter(df[column], rng, decimal_comma=True, fmt='%.2f')
+    # Missing moisture readings, so the dropna path is exercised
+    df.loc[rng.random(len(df)) < na_rate, 'Volumetric soil moisture'] = 'NA'
+    return _write(df, path)
+
+
+def generate_leaf_traits(path, scale, rng):
+    df = _resample(_read_raw(LEAF_TRAITS_DATA_PATH), scale, rng)
+    df['SAMPLING_DATE'] = _shift_dates(df['SAMPLING_DATE'], rng)
+    for column in LEAF_TRAIT_VALUE_COLUMNS:
+        df[column] = _jitter(df[column], rng)
+    return _write(df, path)
+
+
+def generate_campaign(directory, scale, seed=0):
+    """Write PAI, soil moisture and leaf trait files `scale` times the sample sizes, under the real file names."""
+    os.makedirs(directory, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    return {
+        'pai': generate_pai(os.path.join(directory, os.path.basename(PAI_DATA_PATH)), scale, rng),
+        'soil_moisture': generate_soil_moisture(os.path.join(directory, os.path.basename(SOIL_MOISTURE_DATA_PATH)), scale, rng),
+        'leaf_traits': generate_leaf_traits(os.path.join(directory, os.path.basename(LEAF_TRAITS_DATA_PATH)), scale, rng),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate synthetic SENTHYMED_MEDOAK campaign files.')
+    parser.add_argument('directory')
+    parser.add_argument('--scale', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    for name, path in generate_campaign(args.directory, args.scale, args.seed).items():
+        print(f"{name}: {path}")